@@ -0,0 +1,51 @@
+import os
+
+from tkinter import PhotoImage
+
+"""
+Cache of the background picture of the pages.
+Casino.jpg is 1920x1200 while the pages are 600x600 or 900x600, so decoding the JPEG and handing the full picture to tkinter
+on every page is wasted work. Instead:
+        1-The picture is decoded and resized (covering the page and cropped to its centre) once with Pillow and saved
+          in CACHE_FOLDER as a PPM file, named after the source file, the size and the modification time of the source,
+          so replacing Casino.jpg makes a new cached file.
+        2-tkinter reads PPM files by itself, when the cached file exists neither Pillow nor the JPEG decoder is needed.
+        3-The PhotoImage is kept in memory and given again to every page of the same size, e.g. when the Registration page is opened again.
+"""
+CACHE_FOLDER = '.assets_cache'
+
+# PhotoImage of every (source, width, height) already loaded
+Images = dict()
+
+# The PPM file holding the source picture resized to Width x Height, made with Pillow if it is not cached yet
+def resized_file(Path, Width, Height):
+    Name = os.path.splitext(os.path.basename(Path))[0]
+    CachePath = os.path.join(CACHE_FOLDER, f'{Name}_{Width}x{Height}_{os.stat(Path).st_mtime_ns}.ppm')
+    if os.path.exists(CachePath):
+        return CachePath
+
+    from PIL import Image, ImageOps  #pip install Pillow
+    with Image.open(Path) as Source:
+        Resized = ImageOps.fit(Source.convert('RGB'), (Width, Height), Image.LANCZOS)
+
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    #Write to a temporary file first so a page never reads a half written file
+    Temporary = CachePath + f'.{os.getpid()}.tmp'
+    Resized.save(Temporary, 'PPM')
+    os.replace(Temporary, CachePath)
+
+    #Older cached files of the same picture and size are not needed any more
+    for File in os.listdir(CACHE_FOLDER):
+        if File.startswith(f'{Name}_{Width}x{Height}_') and os.path.join(CACHE_FOLDER, File) != CachePath:
+            os.remove(os.path.join(CACHE_FOLDER, File))
+    return CachePath
+
+# The background picture for a window of Width x Height, the PhotoImage is reused while the Tk root that made it exists
+def background(Window, Width, Height, Path='Casino.jpg'):
+    Root = Window._root()
+    Key = (Path, Width, Height)
+    Image = Images.get(Key)
+    if Image is None or Image.tk is not Root.tk:
+        Image = PhotoImage(master=Root, file=resized_file(Path, Width, Height))
+        Images[Key] = Image
+    return Image
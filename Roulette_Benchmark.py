@@ -0,0 +1,369 @@
+import argparse
+import json
+import operator
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from contextlib import contextmanager
+
+import Roulette_Database
+import Roulette_Password
+
+from Roulette_Database import LedgerBatch, get_history, get_history_page, insert_player, insert_transaction, open_database, update_password
+from Roulette_Engine import BET_CODES, GUESS_CODES, load_numpy, settle, settle_batch
+from Roulette_Password import check_login, hash_password
+from Roulette_RNG import PCG64Source
+from Roulette_Sort import sort_history
+
+"""
+Benchmarks of the software, run from the command line:
+        python Roulette_Benchmark.py sort --rows 1000000
+        python Roulette_Benchmark.py startup
+        python Roulette_Benchmark.py settle --bets 100000
+        python Roulette_Benchmark.py ledger --transactions 2000
+        python Roulette_Benchmark.py history --rows 10000 1000000 10000000
+        python Roulette_Benchmark.py treeview --rows 100000
+        python Roulette_Benchmark.py password --costs 12 13 14 15 16 --target 0.25
+        python Roulette_Benchmark.py --json results.json all
+        python Roulette_Benchmark.py compare before.json after.json --threshold 0.1
+The benchmarks touching the database use a new database in a temporary folder, never Roulette.db.
+With --json, given before the benchmark, the results are written to a file together with the commit they were measured on, so two runs can be compared:
+compare flags every timing that got slower (or every rate that got lower) by more than the threshold and exits with status 1.
+"""
+
+# Importing the GUI module (without opening a window) should take less than this many seconds, including the interpreter start
+STARTUP_TARGET = 0.15
+
+# A login (reading the player and verifying the password) should take less than this many seconds,
+# the password benchmark recommends the highest cost within it
+LOGIN_TARGET = 0.25
+
+# Keys of the results that are not timings in seconds: higher is better for the rates, the others are not compared
+HIGHER_IS_BETTER = ('speedup', 'per_second')
+NOT_COMPARED = ('target', 'rows', 'cost')
+
+# The recursive merge sort the history page used before Roulette_Sort, kept as the baseline to compare with
+def legacy_merge_sort(SortList, Operator):
+    OperatorFunction = { ">": operator.gt, "<": operator.lt }
+
+    if len(SortList) > 1:
+        Middle = len(SortList) // 2
+        Left = SortList[:Middle]
+        Right = SortList[Middle:]
+
+        legacy_merge_sort(Left, Operator)
+        legacy_merge_sort(Right, Operator)
+
+        x = 0
+        y = 0
+        i = 0
+
+        while x < len(Left) and y < len(Right):
+            if OperatorFunction[Operator](Left[x] [1], Right[y] [1]):
+              SortList[i] = Left[x]
+              x += 1
+
+            else:
+                SortList[i] = Right[y]
+                y += 1
+
+            i += 1
+
+        while x < len(Left):
+            SortList[i] = Left[x]
+            x += 1
+            i += 1
+
+        while y < len(Right):
+            SortList[i]=Right[y]
+            y += 1
+            i += 1
+
+# Random records shaped like the ones returned by get_history
+def fake_history(Rows, Seed=0):
+    Random = random.Random(Seed)
+    BetTypes = (None, 'single_num', 'odd_even', 'high_low')
+    return [(Random.choice(BetTypes), Random.randint(-10000, 360000), f'2021-05-{Random.randint(10, 28)} 10:00:00')
+            for i in range(Rows)]
+
+# Time the best of Repeat runs of Function on a fresh copy of Data
+def best_time(Function, Data, Repeat):
+    Times = []
+    for i in range(Repeat):
+        Copy = list(Data)
+        Start = time.perf_counter()
+        Function(Copy)
+        Times.append(time.perf_counter() - Start)
+    return min(Times), Copy
+
+# Sort by credit in both directions with the legacy merge sort and with sort_history
+def benchmark_sort(Rows, Repeat):
+    Data = fake_history(Rows)
+    Results = dict()
+    for Operator, Descending in (('<', False), ('>', True)):
+        Legacy, Expected = best_time(lambda Copy: legacy_merge_sort(Copy, Operator), Data, Repeat)
+        New, Sorted = best_time(lambda Copy: sort_history(Copy, 'Credit', Descending), Data, Repeat)
+        #The merge sort is not stable, so only the order of the credits is compared
+        assert [Row[1] for Row in Sorted] == [Row[1] for Row in Expected]
+        Results[f'sort credit {Operator}'] = {'legacy_merge_sort': Legacy, 'sort_history': New, 'speedup': Legacy / New}
+
+    Multi, Sorted = best_time(lambda Copy: sort_history(Copy, ['BetType', ('Credit', True), 'TimeDate']), Data, Repeat)
+    Results['sort game, credit desc, time'] = {'sort_history': Multi}
+    return Results
+
+# Time a fresh interpreter importing each module, importing must not open the database, a window or the optional modules
+def benchmark_startup(Repeat):
+    Folder = os.path.dirname(os.path.abspath(__file__))
+    Results = dict()
+    for Module in ('Roulette_Python', 'Roulette_Engine', 'Roulette_Database'):
+        Times = []
+        for i in range(Repeat):
+            Start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', f'import {Module}'], cwd=Folder, check=True)
+            Times.append(time.perf_counter() - Start)
+        Results[f'import {Module}'] = {'best': min(Times), 'median': statistics.median(Times)}
+    Results['import Roulette_Python']['target'] = STARTUP_TARGET
+    return Results
+
+# A new database in a temporary folder with Players players named player0, player1... each with a large balance
+@contextmanager
+def benchmark_database(Players=1):
+    with tempfile.TemporaryDirectory() as Folder:
+        open_database(os.path.join(Folder, 'Benchmark.db'))
+        try:
+            for i in range(Players):
+                insert_player(f'player{i}', 'password', 'player@example.com', 'Bench', 'Mark', '2000-01-01', 10**12)
+            yield
+        finally:
+            Roulette_Database.Pool.close()
+
+# A ledger that does not write, so only the settlement itself is timed
+class NoLedger:
+    def insert_transaction(self, *Arguments):
+        return True
+
+# Settle Bets bets of every bet option one at a time (validation, spin, payout, without the ledger) and as one batch
+def benchmark_settle(Bets, Repeat):
+    Results = dict()
+    Guesses = {'single_num': 17, 'odd_even': 'odd', 'high_low': 'high'}
+    np = load_numpy()
+    for BetType, Guess in Guesses.items():
+        Source = PCG64Source(0)
+        Single = best_time(lambda Copy: [settle('player0', BetType, 5, Guess, Ledger=NoLedger(), Source=Source) for i in Copy],
+                           range(Bets), Repeat)[0]
+        BetCodes = np.full(Bets, BET_CODES[BetType], dtype=np.int8)
+        GuessValues = np.full(Bets, Guess if BetType == 'single_num' else GUESS_CODES[Guess], dtype=np.int16)
+        Batch = best_time(lambda Copy: settle_batch(None, BetCodes, GuessValues, np.full(Bets, 500, dtype=np.int64), Source=PCG64Source(0)),
+                          [], Repeat)[0]
+        Results[f'settle {BetType}'] = {'rows': Bets, 'settle': Single, 'settle_batch': Batch, 'speedup': Single / Batch,
+                                        'per_second': Bets / Single}
+    return Results
+
+# Write Transactions bets to the ledger committing each one (insert_transaction) and grouped by LedgerBatch
+def benchmark_ledger(Transactions, BatchSize, Repeat):
+    def batched(Copy):
+        with LedgerBatch(BatchSize) as Ledger:
+            for i in Copy:
+                Ledger.insert_transaction('player0', -100, 'odd_even')
+
+    with benchmark_database():
+        Single = best_time(lambda Copy: [insert_transaction('player0', -100, 'odd_even') for i in Copy], range(Transactions), Repeat)[0]
+        Batched = best_time(batched, range(Transactions), Repeat)[0]
+    return {'insert_transaction': {'rows': Transactions, 'seconds': Single, 'per_second': Transactions / Single},
+            f'LedgerBatch {BatchSize}': {'rows': Transactions, 'seconds': Batched, 'per_second': Transactions / Batched}}
+
+# Fill History with Rows records spread over Players players, written with executemany as filling millions with the ledger takes too long
+def fill_history(Rows, Players):
+    Random = random.Random(0)
+    conn = Roulette_Database.connection()
+    BetTypes = (None, 'single_num', 'odd_even', 'high_low')
+    with conn:
+        for Start in range(0, Rows, 100000):
+            conn.executemany("INSERT INTO History (Username, Credit, BetType, TimeDate) VALUES(?, ?, ?, ?)",
+                             ((f'player{i % Players}', Random.randint(-10000, 360000), BetTypes[i % 4], 1600000000 + i)
+                              for i in range(Start, min(Rows, Start + 100000))))
+
+# Latency of the history queries of one player, on a History of every size in Sizes split between Players players
+def benchmark_history(Sizes, Players, Repeat):
+    Results = dict()
+    for Rows in Sizes:
+        with benchmark_database(Players):
+            fill_history(Rows, Players)
+            Count = len(get_history('player0'))
+            Full = best_time(lambda Copy: get_history('player0'), [], Repeat)[0]
+            First = best_time(lambda Copy: get_history_page('player0'), [], Repeat)[0]
+            #A page in the middle of the history, reached with the key of the row before it
+            Middle = get_history_page('player0', Limit=Count // 2 or 1)[-1][-1]
+            Deep = best_time(lambda Copy: get_history_page('player0', After=Middle), [], Repeat)[0]
+            ByCredit = best_time(lambda Copy: get_history_page('player0', Order='Credit', Descending=True), [], Repeat)[0]
+            Results[f'history {Rows} rows'] = {'rows': Count, 'get_history': Full, 'first page': First,
+                                               'middle page': Deep, 'first page by credit': ByCredit}
+    return Results
+
+# Time to fill a Treeview with Rows records at once (the history page before the windowed table) and with one page
+def benchmark_treeview(Rows, PageSize, Repeat):
+    from tkinter import Tk, TclError, ttk
+    try:
+        Root = Tk()
+    except TclError:
+        print('treeview: skipped, no display')
+        return dict()
+    Root.withdraw()
+    Data = fake_history(Rows)
+
+    def fill(Copy):
+        Table = ttk.Treeview(Root, columns=('Game', 'Credit', 'TimeDate'))
+        for i, Row in enumerate(Copy):
+            Table.insert(parent='', index='end', iid=i, text='', values=Row)
+        Root.update_idletasks()
+        Table.destroy()
+    Full = best_time(fill, Data, Repeat)[0]
+    Page = best_time(fill, Data[:PageSize], Repeat)[0]
+    Root.destroy()
+    return {f'treeview {Rows} rows': {'rows': Rows, 'all rows': Full, f'one page of {PageSize}': Page}}
+
+# Latency of a login (check_login) with the password hashed at every cost of Costs, of a login remembered by the cache
+# of verified passwords and of an unknown username. The recommended cost is the highest one whose login is within Target
+def benchmark_password(Costs, Target, Repeat):
+    Results = dict()
+    Recommended = None
+    Previous = Roulette_Password.Cost
+    with benchmark_database():
+        try:
+            for Cost in Costs:
+                Roulette_Password.set_cost(Cost)
+                update_password('player0', hash_password('Secret#1'))
+                def login(Copy):
+                    Roulette_Password.VerifiedCache.clear()
+                    check_login('player0', 'Secret#1')
+                Login = best_time(login, [], Repeat)[0]
+                Cached = best_time(lambda Copy: check_login('player0', 'Secret#1'), [], Repeat)[0]
+                Unknown = best_time(lambda Copy: check_login('nobody', 'Secret#1'), [], Repeat)[0]
+                Results[f'password {Roulette_Password.ALGORITHM} cost {Cost}'] = {'login': Login, 'cached login': Cached,
+                                                                                  'unknown username': Unknown}
+                if Login <= Target:
+                    Recommended = Cost
+        finally:
+            Roulette_Password.set_cost(Previous)
+    Results['password recommended'] = {'cost': Recommended if Recommended is not None else min(Costs), 'target': Target}
+    return Results
+
+# The commit the benchmarks run on, None outside of a git checkout
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Compare the results of two runs, return the lines to print and the regressions (every key slower by more than Threshold)
+def compare(Before, After, Threshold):
+    Lines = []
+    Regressions = []
+    for Name, Timings in After['results'].items():
+        for Key, Value in Timings.items():
+            Old = Before['results'].get(Name, {}).get(Key)
+            if Old is None or Key in NOT_COMPARED or not Old or not Value:
+                continue
+            #Change > 0 is always worse: more seconds or a lower rate
+            Change = Old / Value - 1 if Key in HIGHER_IS_BETTER else Value / Old - 1
+            Line = f'{Name}: {Key} {format_value(Key, Old)} -> {format_value(Key, Value)} ({Change:+.1%} worse)' if Change > 0 else \
+                   f'{Name}: {Key} {format_value(Key, Old)} -> {format_value(Key, Value)} ({-Change:.1%} better)'
+            if Change > Threshold:
+                Line += '  REGRESSION'
+                Regressions.append(Line)
+            Lines.append(Line)
+    return Lines, Regressions
+
+def format_value(Key, Value):
+    if Key == 'speedup':
+        return f'{Value:.3f}x'
+    if Key == 'per_second':
+        return f'{Value:,.0f}/s'
+    if Key in NOT_COMPARED:
+        return f'{Value:g}'
+    return f'{Value:.3f}s' if Value >= 0.1 else f'{Value*1000:.3f}ms'
+
+def main():
+    Parser = argparse.ArgumentParser(description='Benchmarks of the Roulette software')
+    Parser.add_argument('--json', help='write the results to this file, with the commit they were measured on')
+    Commands = Parser.add_subparsers(dest='command', required=True)
+    Sort = Commands.add_parser('sort', help='legacy merge sort against sort_history')
+    Sort.add_argument('--rows', type=int, default=1000000)
+    Sort.add_argument('--repeat', type=int, default=3)
+    Startup = Commands.add_parser('startup', help='time to import the modules in a fresh interpreter')
+    Startup.add_argument('--repeat', type=int, default=10)
+    Settle = Commands.add_parser('settle', help='settlement of every bet option one at a time and as a batch')
+    Settle.add_argument('--bets', type=int, default=100000)
+    Settle.add_argument('--repeat', type=int, default=3)
+    Ledger = Commands.add_parser('ledger', help='throughput of insert_transaction and of LedgerBatch')
+    Ledger.add_argument('--transactions', type=int, default=2000)
+    Ledger.add_argument('--batch', type=int, default=500)
+    Ledger.add_argument('--repeat', type=int, default=3)
+    History = Commands.add_parser('history', help='latency of the history queries for tables of different sizes')
+    History.add_argument('--rows', type=int, nargs='+', default=[10000, 1000000])
+    History.add_argument('--players', type=int, default=100)
+    History.add_argument('--repeat', type=int, default=5)
+    Treeview = Commands.add_parser('treeview', help='time to fill the table of the history page (needs a display)')
+    Treeview.add_argument('--rows', type=int, default=100000)
+    Treeview.add_argument('--page', type=int, default=100)
+    Treeview.add_argument('--repeat', type=int, default=3)
+    Password = Commands.add_parser('password', help='login latency for every password hashing cost, and the cost to use')
+    Password.add_argument('--costs', type=int, nargs='+', default=[12, 13, 14, 15, 16])
+    Password.add_argument('--target', type=float, default=LOGIN_TARGET, help='login latency target in seconds')
+    Password.add_argument('--repeat', type=int, default=3)
+    Commands.add_parser('all', help='every benchmark above with its default arguments')
+    Compare = Commands.add_parser('compare', help='compare two JSON results and flag the regressions')
+    Compare.add_argument('before')
+    Compare.add_argument('after')
+    Compare.add_argument('--threshold', type=float, default=0.1, help='relative slowdown flagged as a regression')
+    Arguments = Parser.parse_args()
+
+    if Arguments.command == 'compare':
+        with open(Arguments.before) as Before, open(Arguments.after) as After:
+            Lines, Regressions = compare(json.load(Before), json.load(After), Arguments.threshold)
+        print('\n'.join(Lines))
+        if Regressions:
+            print(f'{len(Regressions)} regression(s) above {Arguments.threshold:.0%}')
+            sys.exit(1)
+        return
+
+    if Arguments.command == 'sort':
+        Results = benchmark_sort(Arguments.rows, Arguments.repeat)
+    elif Arguments.command == 'startup':
+        Results = benchmark_startup(Arguments.repeat)
+    elif Arguments.command == 'settle':
+        Results = benchmark_settle(Arguments.bets, Arguments.repeat)
+    elif Arguments.command == 'ledger':
+        Results = benchmark_ledger(Arguments.transactions, Arguments.batch, Arguments.repeat)
+    elif Arguments.command == 'history':
+        Results = benchmark_history(Arguments.rows, Arguments.players, Arguments.repeat)
+    elif Arguments.command == 'treeview':
+        Results = benchmark_treeview(Arguments.rows, Arguments.page, Arguments.repeat)
+    elif Arguments.command == 'password':
+        Results = benchmark_password(Arguments.costs, Arguments.target, Arguments.repeat)
+    else:
+        Results = {**benchmark_settle(100000, 3), **benchmark_ledger(2000, 500, 3), **benchmark_history([10000, 1000000], 100, 5),
+                   **benchmark_sort(1000000, 3), **benchmark_treeview(100000, 100, 3), **benchmark_startup(10),
+                   **benchmark_password([12, 13, 14, 15, 16], LOGIN_TARGET, 3)}
+
+    if 'import Roulette_Python' in Results and Results['import Roulette_Python']['median'] > STARTUP_TARGET:
+        print(f'Importing Roulette_Python is slower than the target of {STARTUP_TARGET}s')
+    if 'password recommended' in Results:
+        print(f"Set ROULETTE_PASSWORD_COST={Results['password recommended']['cost']} for logins within {Results['password recommended']['target']}s")
+    for Name, Timings in Results.items():
+        print(Name + ': ' + ', '.join(f'{Key} {format_value(Key, Value)}' for Key, Value in Timings.items()))
+
+    if Arguments.json:
+        with open(Arguments.json, 'w') as File:
+            json.dump({'commit': current_commit(), 'python': platform.python_version(), 'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                       'command': Arguments.command, 'results': Results}, File, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,571 @@
+import sqlite3
+import threading
+
+from Roulette_Metrics import timed
+
+"""
+Create a database with the name Roulete, it contains two tables Players and History and they have one-to-many relationship respectively.
+Table Players will store the data of players while table History will store any transactions such as deposit, widthraw or betting rewards.
+The foreign key is field Username in History and it refers to field Username in Players as a primary key.
+
+Each field within the tables is assigned with data type and sometimes a Validation
+for example, Balance in table Players is an Integer number of cents and has two validations: Not empty and greater than or equal to 0.
+Every amount of money (Balance, Credit and the totals of PlayerStats) is stored in cents, see Roulette_Money.py.
+Sqlite3 code is easy to understand as it has many similarities with other RDBMS.
+
+The database layer lives in its own module so it can be imported without tkinter,
+the GUI (Roulette_Python.py), the settlement engine and any script share the same functions.
+"""
+
+# Version of the tables below, stored in the database file with PRAGMA user_version
+# 0: History without a primary key and with TimeDate as a localtime TEXT
+# 1: History with HistoryID as INTEGER PRIMARY KEY, TimeDate as epoch seconds and indexes for the history queries
+# 2: table SpinLog and History.SpinID, the spin every bet was settled with
+# 3: table PlayerStats, filled from the existing History
+# 4: Players.Balance, History.Credit and the totals of PlayerStats as INTEGER cents instead of REAL dollars
+SCHEMA_VERSION = 4
+
+# Table Players, Name is only changed by the migration to version 4 which builds the new table beside the old one
+PLAYERS_TABLE = """ CREATE TABLE IF NOT EXISTS {Name} (
+        Username  TEXT UNIQUE NOT NULL,
+        Password  TEXT NOT NULL,
+        Email     TEXT NOT NULL,
+        Forename  TEXT,
+        Surname   TEXT,
+        Birth     TEXT,
+        Balance   INTEGER NOT NULL DEFAULT 0,
+        CHECK(Balance >= 0),
+        PRIMARY KEY(Username)
+            )"""
+
+# Table History, TimeDate is stored as seconds since the epoch (UTC) and only converted to text when displayed.
+# Money is the type of Credit: INTEGER cents, REAL dollars only for the migration to version 1 which copies dollars
+HISTORY_TABLE = """ CREATE TABLE IF NOT EXISTS History(
+        HistoryID INTEGER PRIMARY KEY,
+        Username  TEXT NOT NULL,
+        Credit    {Money} NOT NULL,
+        BetType   TEXT,
+        TimeDate  INTEGER NOT NULL,
+        SpinID    INTEGER REFERENCES SpinLog (SpinID),
+        FOREIGN KEY (Username) REFERENCES Players (Username)
+            )"""
+
+# Table SpinLog, every spin with what is needed to draw it again (see Roulette_RNG.py): the source, its seed and the position
+SPINLOG_TABLE = """ CREATE TABLE IF NOT EXISTS SpinLog(
+        SpinID    INTEGER PRIMARY KEY,
+        Source    TEXT NOT NULL,
+        Seed      TEXT NOT NULL,
+        Position  INTEGER NOT NULL,
+        RandValue INTEGER NOT NULL,
+        TimeDate  INTEGER NOT NULL
+            )"""
+
+# Table PlayerStats, the totals of every player kept up to date by write_transaction in the same transaction as the History record,
+# so they are read with one primary key lookup instead of aggregating History. Withdrawals are positive amounts,
+# LastActivity is epoch seconds like History.TimeDate
+PLAYERSTATS_TABLE = """ CREATE TABLE IF NOT EXISTS PlayerStats(
+        Username      TEXT PRIMARY KEY REFERENCES Players (Username),
+        TotalStaked   INTEGER NOT NULL DEFAULT 0,
+        TotalWon      INTEGER NOT NULL DEFAULT 0,
+        SingleNumBets INTEGER NOT NULL DEFAULT 0,
+        OddEvenBets   INTEGER NOT NULL DEFAULT 0,
+        HighLowBets   INTEGER NOT NULL DEFAULT 0,
+        Deposits      INTEGER NOT NULL DEFAULT 0,
+        Withdrawals   INTEGER NOT NULL DEFAULT 0,
+        LastActivity  INTEGER
+            ) WITHOUT ROWID"""
+
+# Compute the totals of the players from table History (Where selects the players, all of them when empty),
+# used by the migration to version 3 and after a bulk import. The sums are exact as the credits are whole cents.
+# History does not keep the stake, a lost bet credits minus the stake and a won one the stake times the payout
+# of its bet option (36 for single_num, 2 for the others when this version was made)
+REBUILD_STATS = """INSERT OR REPLACE INTO PlayerStats
+                   SELECT Players.Username,
+                          SUM(CASE WHEN BetType IS NULL THEN 0 WHEN Credit < 0 THEN -Credit
+                                     WHEN BetType = 'single_num' THEN Credit / 36 ELSE Credit / 2 END),
+                          SUM(CASE WHEN BetType IS NOT NULL AND Credit > 0 THEN Credit ELSE 0 END),
+                          COUNT(CASE WHEN BetType = 'single_num' THEN 1 END),
+                          COUNT(CASE WHEN BetType = 'odd_even' THEN 1 END),
+                          COUNT(CASE WHEN BetType = 'high_low' THEN 1 END),
+                          SUM(CASE WHEN BetType IS NULL AND Credit > 0 THEN Credit ELSE 0 END),
+                          SUM(CASE WHEN BetType IS NULL AND Credit < 0 THEN -Credit ELSE 0 END),
+                          MAX(TimeDate)
+                   FROM Players LEFT JOIN History ON History.Username = Players.Username
+                   {Where} GROUP BY Players.Username"""
+
+# The fields of table PlayerStats in the order of get_player_stats, and the counter of every bet option
+PLAYER_STATS_FIELDS = ('Username', 'TotalStaked', 'TotalWon', 'SingleNumBets', 'OddEvenBets', 'HighLowBets',
+                       'Deposits', 'Withdrawals', 'LastActivity')
+BET_COUNTERS = {'single_num': 'SingleNumBets', 'odd_even': 'OddEvenBets', 'high_low': 'HighLowBets'}
+STATS_MONEY_FIELDS = ('TotalStaked', 'TotalWon', 'Deposits', 'Withdrawals')
+
+# The history of a player is always queried by username and in time or credit order, the filters use BetType
+HISTORY_INDEXES = {'HistoryUserTime': "CREATE INDEX IF NOT EXISTS HistoryUserTime ON History (Username, TimeDate)",
+                   'HistoryUserCredit': "CREATE INDEX IF NOT EXISTS HistoryUserCredit ON History (Username, Credit)",
+                   'HistoryBetType': "CREATE INDEX IF NOT EXISTS HistoryBetType ON History (BetType)"}
+
+"""
+Connections: a sqlite3 connection can only be used safely by one thread at a time, so every thread gets its own connection
+from ConnectionPool (connection() returns the one of the calling thread). A connection released by a thread that is done
+with the database is kept and handed to the next thread instead of opening a new one.
+Every connection is set up with the PRAGMAS below:
+        journal_mode=WAL   readers (history page, balances) do not wait for a bet being written and the writer does not wait for them
+        synchronous=NORMAL in WAL mode a commit does not wait for the disk, a crash of the software still can not lose a commit
+        cache_size         16MB of pages cached per connection (negative values are in KiB)
+        mmap_size          up to 256MB of the file is read through memory mapping instead of read() calls
+Statements are prepared once per connection and reused from a cache of CACHED_STATEMENTS statements.
+"""
+PRAGMAS = {'foreign_keys': 1, 'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'cache_size': -16000, 'mmap_size': 268435456}
+CACHED_STATEMENTS = 256
+BUSY_TIMEOUT = 10
+
+class ConnectionPool:
+    def __init__(self, Path):
+        self.Path = Path
+        self.Local = threading.local()
+        self.Idle = []
+        self.Connections = []
+        self.Lock = threading.Lock()
+
+    # The connection of the calling thread, taken from the idle connections or opened
+    def connection(self):
+        Connection = getattr(self.Local, 'Connection', None)
+        if Connection is None:
+            with self.Lock:
+                Connection = self.Idle.pop() if self.Idle else None
+            if Connection is None:
+                Connection = self.open()
+            self.Local.Connection = Connection
+        return Connection
+
+    def open(self):
+        #check_same_thread is off because a released connection moves to another thread, it is never used by two at once
+        Connection = sqlite3.connect(self.Path, timeout=BUSY_TIMEOUT, cached_statements=CACHED_STATEMENTS, check_same_thread=False)
+        for Name, Value in PRAGMAS.items():
+            Connection.execute(f"PRAGMA {Name} = {Value}")
+        with self.Lock:
+            self.Connections.append(Connection)
+        return Connection
+
+    # Give the connection of the calling thread back to the pool, any transaction left open is rolled back
+    def release(self):
+        Connection = getattr(self.Local, 'Connection', None)
+        if Connection is not None:
+            Connection.rollback()
+            self.Local.Connection = None
+            with self.Lock:
+                self.Idle.append(Connection)
+
+    def close(self):
+        with self.Lock:
+            for Connection in self.Connections:
+                Connection.close()
+            self.Connections.clear()
+            self.Idle.clear()
+        self.Local = threading.local()
+
+# The pool of the open database, None until the first connection is needed
+Pool = None
+
+# Open (or create) the database file, make sure the tables exist and migrate a file created by an older version.
+# Called with the default file by the first connection() when nothing was opened, so importing this module touches no file.
+# Scripts, the table server and benchmarks call it first to use another file.
+# Notice that every thread has its own connection, so ':memory:' would give every thread a different empty database.
+def open_database(Path='Roulette.db'):
+    global Pool
+
+    if Pool is not None:
+        Pool.close()
+    Pool = ConnectionPool(Path)
+
+    conn = connection()
+    conn.execute(PLAYERS_TABLE.format(Name='Players'))
+
+    conn.execute(SPINLOG_TABLE)
+    conn.execute(HISTORY_TABLE.format(Money='INTEGER'))
+    conn.execute(PLAYERSTATS_TABLE)
+    migrate_database()
+    create_history_indexes()
+    return conn
+
+# The connection of the calling thread to the open database
+def connection():
+    if Pool is None:
+        open_database()
+    return Pool.connection()
+
+# Return the connection of the calling thread to the pool, for threads that are done with the database
+def release_connection():
+    if Pool is not None:
+        Pool.release()
+
+# Create the indexes of table History that do not exist
+def create_history_indexes():
+    for Index in HISTORY_INDEXES.values():
+        connection().execute(Index)
+
+# Drop the indexes of table History, a bulk load followed by create_history_indexes is faster than updating them row by row
+def drop_history_indexes():
+    for Name in HISTORY_INDEXES:
+        connection().execute(f"DROP INDEX IF EXISTS {Name}")
+
+# Bring the tables of an older database file up to SCHEMA_VERSION, every step runs in one transaction
+def migrate_database():
+    c = connection().cursor()
+    Version = c.execute("PRAGMA user_version").fetchone()[0]
+
+    if Version < 1:
+        Columns = [Column[1] for Column in c.execute("PRAGMA table_info(History)")]
+        try:
+            c.execute("BEGIN")
+            #Version 0 table: copy the rows in their original order and convert the localtime text to epoch seconds
+            if 'HistoryID' not in Columns:
+                c.execute("ALTER TABLE History RENAME TO HistoryVersion0")
+                c.execute(HISTORY_TABLE.format(Money='REAL'))
+                c.execute("""INSERT INTO History (Username, Credit, BetType, TimeDate)
+                             SELECT Username, Credit, BetType, COALESCE(CAST(strftime('%s', TimeDate, 'utc') AS INTEGER), 0)
+                             FROM HistoryVersion0 ORDER BY rowid""")
+                c.execute("DROP TABLE HistoryVersion0")
+            c.execute("PRAGMA user_version = 1")
+            c.execute("COMMIT")
+        except sqlite3.Error:
+            c.execute("ROLLBACK")
+            raise
+
+    if Version < 2:
+        Columns = [Column[1] for Column in c.execute("PRAGMA table_info(History)")]
+        try:
+            c.execute("BEGIN")
+            if 'SpinID' not in Columns:
+                c.execute("ALTER TABLE History ADD COLUMN SpinID INTEGER REFERENCES SpinLog (SpinID)")
+            c.execute("PRAGMA user_version = 2")
+            c.execute("COMMIT")
+        except sqlite3.Error:
+            c.execute("ROLLBACK")
+            raise
+
+    if Version < 3:
+        try:
+            c.execute("BEGIN")
+            c.execute(REBUILD_STATS.format(Where=''))
+            c.execute("PRAGMA user_version = 3")
+            c.execute("COMMIT")
+        except sqlite3.Error:
+            c.execute("ROLLBACK")
+            raise
+
+    if Version < 4:
+        #Every database older than version 4 holds dollars, whatever the declared type of its columns (e.g. PlayerStats
+        #made by open_database before the migration to version 3), so the money of all three tables is converted to cents.
+        #SQLite can not change the type of a column so the tables are copied. The totals of PlayerStats are copied times 100
+        #as REBUILD_STATS could not give back the stakes written by write_transaction.
+        #Foreign keys are off while Players is replaced (it can only be changed outside of a transaction)
+        c.execute("PRAGMA foreign_keys = OFF")
+        try:
+            c.execute("BEGIN")
+            c.execute(PLAYERS_TABLE.format(Name='PlayersVersion4'))
+            c.execute("""INSERT INTO PlayersVersion4 SELECT Username, Password, Email, Forename, Surname, Birth,
+                         CAST(ROUND(Balance*100) AS INTEGER) FROM Players""")
+            c.execute("DROP TABLE Players")
+            c.execute("ALTER TABLE PlayersVersion4 RENAME TO Players")
+
+            for Name in HISTORY_INDEXES:
+                c.execute(f"DROP INDEX IF EXISTS {Name}")
+            c.execute("ALTER TABLE History RENAME TO HistoryVersion3")
+            c.execute(HISTORY_TABLE.format(Money='INTEGER'))
+            c.execute("""INSERT INTO History (HistoryID, Username, Credit, BetType, TimeDate, SpinID)
+                         SELECT HistoryID, Username, CAST(ROUND(Credit*100) AS INTEGER), BetType, TimeDate, SpinID
+                         FROM HistoryVersion3""")
+            c.execute("DROP TABLE HistoryVersion3")
+
+            c.execute("ALTER TABLE PlayerStats RENAME TO PlayerStatsVersion3")
+            c.execute(PLAYERSTATS_TABLE)
+            Fields = ', '.join(f'CAST(ROUND({Field}*100) AS INTEGER)' if Field in STATS_MONEY_FIELDS else Field
+                               for Field in PLAYER_STATS_FIELDS)
+            c.execute(f"INSERT INTO PlayerStats SELECT {Fields} FROM PlayerStatsVersion3")
+            c.execute("DROP TABLE PlayerStatsVersion3")
+            c.execute("PRAGMA user_version = 4")
+            c.execute("COMMIT")
+        except sqlite3.Error:
+            c.execute("ROLLBACK")
+            raise
+        finally:
+            c.execute("PRAGMA foreign_keys = ON")
+
+
+"""
+The following functions are used to interact with the database such as adding new records or retrieve/query a specific record.
+Notice that Python variables are not added directly but instead in a form of dictionary, and this is to prevent bad input
+and hence a SQL injection attack.
+"""
+
+# Add and register a new player to table Players, Balance in cents
+# Password is stored as given, it should be the hash of Roulette_Password.hash_password
+def insert_player(Username, Password, Email, Forename, Surname, Birth, Balance=0):
+    conn = connection()
+    with conn:
+        conn.execute("INSERT INTO Players Values(:Username, :Password, :Email, :Forename, :Surname, :Birth, :Balance)",
+        {'Username':Username, 'Password':Password, 'Email':Email, 'Forename':Forename, 'Surname':Surname, 'Birth':Birth, 'Balance':Balance})
+
+# Update the balance of the specified username, in table Players, by adding the inserted credit (in cents)
+def update_balance(Username, Credit):
+    conn = connection()
+    with conn:
+        conn.execute("""UPDATE Players SET Balance = Balance + :Credit
+                     WHERE Username=:Username
+        """, {'Username':Username, 'Credit':Credit})
+
+# Replace the stored password hash of the player
+def update_password(Username, Password):
+    conn = connection()
+    with conn:
+        conn.execute("UPDATE Players SET Password=:Password WHERE Username=:Username", {'Username':Username, 'Password':Password})
+
+# Retrieve the specified username record in table Players and return the record as a list
+def get_player(Username):
+    return connection().execute("SELECT * FROM Players WHERE Username=:Username", {'Username':Username}).fetchall()
+
+# Query the balance of the specified username by calling get_player function and extract the balance using list slicing
+def get_balance(Username):
+    return get_player(Username)[-1][-1]
+
+# Add a spin to table SpinLog without committing and return its SpinID
+def write_spin(Spin):
+    return connection().execute("""INSERT INTO SpinLog (Source, Seed, Position, RandValue, TimeDate)
+                                   VALUES(:Source, :Seed, :Position, :RandValue, CAST(strftime('%s', 'now') AS INTEGER))""",
+                                Spin._asdict()).lastrowid
+
+# Add many spins drawn from the same seed at consecutive positions (see PCG64Source.draw_array) without committing,
+# return the SpinID of the first one, the others follow in order
+# The write lock is taken before reading the last SpinID, so another connection can not add a spin in between
+# (a transaction already open has written, so it holds the lock already)
+def write_spins(Source, Seed, First, RandValues):
+    conn = connection()
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    FirstID = conn.execute("SELECT COALESCE(MAX(SpinID), 0) + 1 FROM SpinLog").fetchone()[0]
+    conn.executemany("""INSERT INTO SpinLog VALUES(?, ?, ?, ?, ?, CAST(strftime('%s', 'now') AS INTEGER))""",
+                     ((FirstID + i, Source, Seed, First + i, int(RandValue)) for i, RandValue in enumerate(RandValues)))
+    return FirstID
+
+# Retrieve a spin of table SpinLog as (Source, Seed, Position, RandValue)
+def get_spin(SpinID):
+    return connection().execute("SELECT Source, Seed, Position, RandValue FROM SpinLog WHERE SpinID=:SpinID",
+                                {'SpinID':SpinID}).fetchone()
+
+# The row added to the totals of table PlayerStats by one transaction, Bet is the stake of a bet
+# (when it is not known the stake of a lost bet is taken from its credit)
+def stats_change(Username, Credit, BetType=None, Bet=None):
+    Change = dict.fromkeys(PLAYER_STATS_FIELDS[1:-1], 0)
+    Change['Username'] = Username
+    if BetType is None:
+        Change['Deposits' if Credit > 0 else 'Withdrawals'] = abs(Credit)
+    else:
+        Change['TotalStaked'] = Bet if Bet is not None else max(-Credit, 0)
+        Change['TotalWon'] = max(Credit, 0)
+        if BetType in BET_COUNTERS:
+            Change[BET_COUNTERS[BetType]] = 1
+    return Change
+
+# Add the change to the totals of the player, the row of the player is created by the first transaction
+WRITE_STATS = """INSERT INTO PlayerStats VALUES(:Username, :TotalStaked, :TotalWon, :SingleNumBets, :OddEvenBets, :HighLowBets,
+                                              :Deposits, :Withdrawals, CAST(strftime('%s', 'now') AS INTEGER))
+                ON CONFLICT (Username) DO UPDATE SET
+                    TotalStaked = TotalStaked + excluded.TotalStaked, TotalWon = TotalWon + excluded.TotalWon,
+                    SingleNumBets = SingleNumBets + excluded.SingleNumBets, OddEvenBets = OddEvenBets + excluded.OddEvenBets,
+                    HighLowBets = HighLowBets + excluded.HighLowBets, Deposits = Deposits + excluded.Deposits,
+                    Withdrawals = Withdrawals + excluded.Withdrawals, LastActivity = excluded.LastActivity"""
+
+# Add the credit (in cents) to the player balance, the transaction as a record to table History and to the totals in table PlayerStats,
+# without committing, and return whether it was written.
+# The balance is only updated when it covers the stake of the bet (Bet) or the amount withdrawn: a conditional debit,
+# checked by the UPDATE itself, so an insufficient balance writes nothing and raises nothing (the CHECK on Balance is never hit).
+# SpinID is the spin in table SpinLog the bet was settled with and Bet its stake, both None for deposits and withdraws,
+# Spin is written to table SpinLog only when the balance was updated.
+# Raise sqlite3.IntegrityError when the player does not exist, as the History record would break its foreign key,
+# the player is only looked up when the balance was not updated so an accepted transaction costs no extra query
+def write_transaction(Username, Credit, BetType=None, SpinID=None, Bet=None, Spin=None):
+    Parameters = {'Username':Username, 'Credit':Credit, 'BetType': BetType, 'SpinID': SpinID,
+                  'Required': Bet if Bet is not None else max(-Credit, 0)}
+    conn = connection()
+    with timed('update_balance'):
+        Updated = conn.execute("""UPDATE Players SET Balance = Balance + :Credit
+                               WHERE Username=:Username AND Balance >= :Required
+        """, Parameters).rowcount
+    if Updated == 0:
+        if conn.execute("SELECT 1 FROM Players WHERE Username=:Username", Parameters).fetchone() is None:
+            raise sqlite3.IntegrityError(f'Player {Username} does not exist')
+        return False
+    if Spin is not None:
+        with timed('spin_log'):
+            Parameters['SpinID'] = write_spin(Spin)
+    with timed('history_insert'):
+        conn.execute("""INSERT INTO History (Username, Credit, BetType, TimeDate, SpinID)
+                     VALUES(:Username, :Credit, :BetType, CAST(strftime('%s', 'now') AS INTEGER), :SpinID)""", Parameters)
+    with timed('stats'):
+        conn.execute(WRITE_STATS, stats_change(Username, Credit, BetType, Bet))
+    return True
+
+# Update the player balance and add the transaction to table Hisotry in a single transaction (one commit),
+# so the balance and the history can not get out of sync. Spin is written to table SpinLog in the same transaction,
+# unless the spin is logged already (e.g. one spin shared by a whole table) and SpinID is given instead.
+# Return False, having written nothing, when the balance does not cover the stake or the withdraw,
+# raise sqlite3.IntegrityError when the player does not exist (see write_transaction)
+def insert_transaction(Username, Credit, BetType=None, Spin=None, SpinID=None, Bet=None):
+    conn = connection()
+    try:
+        Written = write_transaction(Username, Credit, BetType, SpinID, Bet, Spin)
+    except BaseException:
+        conn.rollback()
+        raise
+    #Nothing to wait for when nothing was written, the commit only ends the transaction
+    with timed('commit'):
+        conn.commit()
+    return Written
+
+# Retrieve the totals of the player in table PlayerStats as a dict of PLAYER_STATS_FIELDS, all zero before the first transaction
+def get_player_stats(Username):
+    Row = connection().execute("SELECT * FROM PlayerStats WHERE Username=:Username", {'Username':Username}).fetchone()
+    if Row is None:
+        Row = (Username, 0, 0, 0, 0, 0, 0, 0, None)
+    return dict(zip(PLAYER_STATS_FIELDS, Row))
+
+"""
+Group commit: every commit of SQLite waits for the disk (fsync), so settling many bets in a row is limited by the disk
+rather than by the CPU. LedgerBatch writes every transaction straight away (a transaction rejected for an insufficient balance
+writes nothing and the others are kept) but commits only every BatchSize transactions, and when the with block ends.
+If the process dies before a commit the pending transactions are lost together, balance and history stay in sync.
+
+    with LedgerBatch(BatchSize=500) as Ledger:
+        for Username, Credit, BetType in Rows:
+            Ledger.insert_transaction(Username, Credit, BetType)
+"""
+class LedgerBatch:
+    def __init__(self, BatchSize=100):
+        self.BatchSize = BatchSize
+        self.Pending = 0
+        self.Connection = connection()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ErrorType, Error, Traceback):
+        if ErrorType is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    # Same as insert_transaction but the commit is deferred until BatchSize transactions are pending
+    # Return False when the transaction was rejected, raise sqlite3.IntegrityError for a player that does not exist (see write_transaction)
+    def insert_transaction(self, Username, Credit, BetType=None, Spin=None, SpinID=None, Bet=None):
+        if not write_transaction(Username, Credit, BetType, SpinID, Bet, Spin):
+            return False
+        self.Pending += 1
+        if self.Pending >= self.BatchSize:
+            self.commit()
+        return True
+
+    # Log a spin shared by many bets of the batch and return its SpinID, committed with them
+    def log_spin(self, Spin):
+        return write_spin(Spin)
+
+    def commit(self):
+        with timed('commit'):
+            self.Connection.commit()
+        self.Pending = 0
+
+    # Drop every transaction written since the last commit
+    def rollback(self):
+        self.Connection.rollback()
+        self.Pending = 0
+
+# Query all records in table History for the specified username and return them as a list of tuples
+# In other words, return all transactions for the specified username, oldest first
+# TimeDate is converted back to the local 'YYYY-MM-DD HH:MM:SS' text, the rows are read in the order of index HistoryUserTime
+def get_history(Username):
+    c = connection().cursor()
+    c.execute("""SELECT BetType, Credit, datetime(TimeDate, 'unixepoch', 'localtime') FROM History
+                 WHERE Username=:Username ORDER BY TimeDate, HistoryID""", {'Username':Username})
+    return c.fetchall()
+
+"""
+Keyset pagination of the history: instead of loading every record of a player, the history page asks for one page at a time.
+A page is continued from the key (Order column, HistoryID) of the last row already shown (After) or,
+when scrolling back up, from the key of the first row shown (Before).
+Sorting (Order and Descending) and filtering (Games: True for bets only, False for deposits/withdraws only) are part of the query,
+ORDER BY walks index HistoryUserTime or HistoryUserCredit and stops after Limit rows,
+so every page costs the same however long the history of the player is.
+Every row is (HistoryID, BetType, Credit, TimeDate as text, key), key being the tuple to continue from.
+"""
+HISTORY_ORDERS = ('TimeDate', 'Credit')
+
+def get_history_page(Username, After=None, Before=None, Limit=100, Order='TimeDate', Descending=False, Games=None):
+    if Order not in HISTORY_ORDERS:
+        raise ValueError(f'History can only be ordered by {HISTORY_ORDERS}')
+
+    #Reading backwards (Before) walks the index in the opposite direction and the page is reversed afterwards
+    Backwards = Before is not None and After is None
+    Direction = "DESC" if Descending != Backwards else "ASC"
+    Parameters = {'Username':Username, 'Limit':Limit}
+
+    Where = ""
+    if Games is True:
+        Where += " AND BetType IS NOT NULL"
+    elif Games is False:
+        Where += " AND BetType IS NULL"
+    Key = After if After is not None else Before
+    if Key is not None:
+        Parameters['Value'], Parameters['ID'] = Key
+        Where += f" AND ({Order}, HistoryID) {'<' if Direction == 'DESC' else '>'} (:Value, :ID)"
+
+    c = connection().cursor()
+    c.execute(f"""SELECT HistoryID, BetType, Credit, datetime(TimeDate, 'unixepoch', 'localtime'), {Order} FROM History
+                  WHERE Username=:Username{Where}
+                  ORDER BY {Order} {Direction}, HistoryID {Direction} LIMIT :Limit""", Parameters)
+    Rows = [(HistoryID, BetType, Credit, DateTime, (Value, HistoryID))
+            for HistoryID, BetType, Credit, DateTime, Value in c.fetchall()]
+    #Pages read backwards are returned in the normal order as well
+    if Backwards:
+        Rows.reverse()
+    return Rows
+
+# The columns of iter_history, in order
+EXPORT_COLUMNS = ('HistoryID', 'Username', 'BetType', 'Credit', 'TimeDate', 'SpinID')
+
+# Stream records of table History as lists of at most BatchSize rows (EXPORT_COLUMNS), so any number of records
+# can be exported with the memory of one batch: the cursor is read with fetchmany instead of fetchall.
+# Filters: Username, TimeDate from Start (included) to End (excluded) in epoch seconds, and BetTypes, a list of bet options
+# where None stands for the deposits and withdraws. A single player is read in the order of index HistoryUserTime,
+# the whole table in the order of HistoryID. LocalTime gives TimeDate as local 'YYYY-MM-DD HH:MM:SS' text instead of epoch seconds.
+def iter_history(Username=None, Start=None, End=None, BetTypes=None, BatchSize=10000, LocalTime=False):
+    Conditions = []
+    Parameters = {'Username':Username, 'Start':Start, 'End':End}
+    if Username is not None:
+        Conditions.append("Username=:Username")
+    if Start is not None:
+        Conditions.append("TimeDate >= :Start")
+    if End is not None:
+        Conditions.append("TimeDate < :End")
+    if BetTypes is not None:
+        Names = [BetType for BetType in BetTypes if BetType is not None]
+        Parameters.update({f'BetType{i}': BetType for i, BetType in enumerate(Names)})
+        Options = [f"BetType IN ({', '.join(f':BetType{i}' for i in range(len(Names)))})"] if Names else []
+        if None in BetTypes:
+            Options.append("BetType IS NULL")
+        Conditions.append(f"({' OR '.join(Options) or '0'})")
+
+    TimeDate = "datetime(TimeDate, 'unixepoch', 'localtime')" if LocalTime else "TimeDate"
+    Order = "TimeDate, HistoryID" if Username is not None else "HistoryID"
+    c = connection().cursor()
+    c.arraysize = BatchSize
+    c.execute(f"""SELECT HistoryID, Username, BetType, Credit, {TimeDate}, SpinID FROM History
+                  {'WHERE ' + ' AND '.join(Conditions) if Conditions else ''}
+                  ORDER BY {Order}""", Parameters)
+    try:
+        while True:
+            Rows = c.fetchmany()
+            if not Rows:
+                break
+            yield Rows
+    finally:
+        c.close()
@@ -0,0 +1,205 @@
+from collections import namedtuple
+
+from Roulette_Database import LedgerBatch, insert_transaction, write_spins
+from Roulette_Metrics import timed
+from Roulette_RNG import get_default, load_numpy
+from Roulette_Validation import messages, normalise_guess, validate_bet
+
+"""
+Settlement engine for the betting options, it does not touch tkinter so it can be imported by the GUI,
+scripts, services and benchmarks alike.
+Settling a bet always follows the same steps:
+        1-Validate the bet amount (aka staked amount, in dollars, converted to cents) and the player guess for the chosen bet option,
+          the balance of the player has to cover the bet amount
+        2-Spin the wheel, a random number from 1 to 36 drawn from a source of Roulette_RNG.py (by default the cryptographic one)
+        3-Compare the player guess with the outcome of the spin
+        4-Compute the payout: the bet times the reward multiplier when the player wins, minus the bet otherwise
+        5-Write the payout to the ledger (balance in table Players, a record in table History, the totals in table PlayerStats)
+          with the spin (table SpinLog), the ledger checks again that the balance covers the bet
+"""
+
+# Reward multiplier of every bet option, the player is rewarded Bet*multiplier when winning
+PAYOUTS = {'single_num': 36, 'odd_even': 2, 'high_low': 2}
+
+# Integer codes of the bet options and of the word guesses, used by the vectorized batch settlement
+BET_CODES = {'single_num': 0, 'odd_even': 1, 'high_low': 2}
+GUESS_CODES = {'even': 0, 'odd': 1, 'low': 0, 'high': 1}
+
+# The outcome of a settled bet, Bet and Credit are in cents (see Roulette_Money.py), Credit is the amount written to the ledger
+# (negative when the player lost)
+# Accepted is false when the balance of the player did not cover the bet, nothing was written and Won, Credit and RandValue are empty
+BetResult = namedtuple('BetResult', ['Username', 'BetType', 'Bet', 'Guess', 'RandValue', 'Won', 'Credit', 'Accepted'], defaults=(True,))
+
+# The outcome of a settled batch, one entry per bet in every array
+BatchResult = namedtuple('BatchResult', ['RandValues', 'Won', 'Credits'])
+
+# Raised when the bet amount or the guess is invalid, Errors maps the invalid field ('bet' or 'guess') to a message
+# and Codes to its error code (see Roulette_Validation.py)
+class BetError(ValueError):
+    def __init__(self, Errors, Codes=None):
+        super().__init__(' '.join(Errors.values()))
+        self.Errors = Errors
+        self.Codes = Codes or dict()
+
+# Spin the wheel and return the number the ball landed on, use Source.spin() instead to also get how to replay it
+def spin(Source=None):
+    return (Source or get_default()).spin().RandValue
+
+# The winning guess of the bet option for the number the ball landed on
+def outcome(BetType, RandValue):
+    if BetType == 'single_num':
+        return RandValue
+    elif BetType == 'odd_even':
+        return 'even' if RandValue % 2 == 0 else 'odd'
+    else:
+        return 'low' if RandValue <= 18 else 'high'
+
+# Check the bet amount (in dollars) and the guess of the bet option and return them parsed as (Bet in cents, Guess)
+# All invalid fields are reported together in one BetError
+def parse_bet(BetType, Bet, UserGuess):
+    Bet, Guess, Errors = validate_bet(BetType, Bet, UserGuess)
+    if Errors:
+        raise BetError(messages(Errors), Errors)
+    return Bet, Guess
+
+# The credit written to the ledger for the bet
+def payout(BetType, Bet, Won):
+    return Bet*PAYOUTS[BetType] if Won else Bet*-1
+
+# Validate, spin, compare and write the payout of one bet then return the BetResult
+# The spin is drawn from Source (a source of Roulette_RNG.py, the default one when None) and logged with the bet.
+# RandValue can be given to settle a bet against a known spin, e.g. a shared table spin or a replay,
+# with SpinID when that spin is already in table SpinLog
+# Ledger can be a LedgerBatch to group the commits of many bets, otherwise every bet is committed on its own
+# Balance, when known (e.g. held by the session of the player), rejects a bet it does not cover before spinning,
+# the ledger rejects it anyway when the balance in the database does not cover it
+def settle(Username, BetType, Bet, UserGuess, RandValue=None, Ledger=None, Source=None, SpinID=None, Balance=None):
+    with timed('validation'):
+        Bet, Guess = parse_bet(BetType, Bet, UserGuess)
+    if Balance is not None and Bet > Balance:
+        return BetResult(Username, BetType, Bet, Guess, None, False, 0, False)
+    Spin = None
+    if RandValue is None:
+        with timed('rng'):
+            Spin = (Source or get_default()).spin()
+        RandValue = Spin.RandValue
+
+    Won = Guess == outcome(BetType, RandValue)
+    Credit = payout(BetType, Bet, Won)
+    if Ledger is None:
+        Accepted = insert_transaction(Username, Credit, BetType, Spin, SpinID, Bet)
+    else:
+        Accepted = Ledger.insert_transaction(Username, Credit, BetType, Spin, SpinID, Bet)
+    if not Accepted:
+        return BetResult(Username, BetType, Bet, Guess, None, False, 0, False)
+    return BetResult(Username, BetType, Bet, Guess, RandValue, Won, Credit)
+
+"""
+Batch settlement: instead of settling one bet at a time with a Python comparison, a whole table round
+or a replay of historical bets is settled with NumPy arrays:
+        1-Bet types and guesses are encoded as integers (BET_CODES and GUESS_CODES, single_num guesses are the number itself)
+        2-All spins are drawn in one call to the generator, or a single shared spin is broadcast to every bet
+        3-The outcome of every spin is computed for its bet option (number, parity or high/low) and compared with the guesses
+        4-Payouts are computed with a mask: Bet*multiplier for the winners and minus the bet for the others,
+          bets and payouts are int64 arrays of cents so the credits of a batch add up exactly
+"""
+
+# Encode a column of bet types into BET_CODES, integer arrays are taken as codes already
+def encode_bet_types(BetTypes):
+    np = load_numpy()
+    BetTypes = np.asarray(BetTypes)
+    if BetTypes.dtype.kind in 'iu':
+        #Checked before the cast, which would wrap e.g. 256 around to 0
+        if BetTypes.size and (BetTypes.min() < 0 or BetTypes.max() >= len(BET_CODES)):
+            raise KeyError('Unknown bet type code')
+        return BetTypes.astype(np.int8)
+
+    #Only the distinct values are looked up in Python, the rest is a vectorized gather
+    Unique, Inverse = np.unique(BetTypes.astype(str), return_inverse=True)
+    try:
+        Lookup = np.array([BET_CODES[BetType] for BetType in Unique], dtype=np.int8)
+    except KeyError as Error:
+        raise KeyError(f'Unknown bet type {Error.args[0]}') from None
+    return Lookup[Inverse.reshape(-1)]
+
+# Encode a column of guesses for the given bet codes, returning -1 where the guess is not valid for its bet option
+def encode_guesses(BetCodes, Guesses):
+    np = load_numpy()
+    Guesses = np.asarray(Guesses)
+    if Guesses.dtype.kind in 'iu':
+        #Checked before the cast, which would wrap e.g. 65543 around to 7
+        Valid = np.where(BetCodes == 0, (Guesses >= 1) & (Guesses <= 36), (Guesses == 0) | (Guesses == 1))
+        return np.where(Valid, Guesses, -1).astype(np.int16)
+
+    #For every distinct guess work out its value as a number, as odd/even and as low/high, the way validate_bet reads it
+    Unique, Inverse = np.unique(Guesses.astype(str), return_inverse=True)
+    Inverse = Inverse.reshape(-1)
+    Number = np.full(len(Unique), -1, dtype=np.int16)
+    Parity = np.full(len(Unique), -1, dtype=np.int16)
+    Range = np.full(len(Unique), -1, dtype=np.int16)
+    for i, Guess in enumerate(Unique):
+        Number[i] = normalise_guess('single_num', Guess)[0] or -1
+        Parity[i] = GUESS_CODES.get(normalise_guess('odd_even', Guess)[0], -1)
+        Range[i] = GUESS_CODES.get(normalise_guess('high_low', Guess)[0], -1)
+    return np.choose(BetCodes, [Number[Inverse], Parity[Inverse], Range[Inverse]])
+
+# Settle arrays of bets at once and return a BatchResult of arrays, Bets (an integer array) and the credits are in cents.
+# RandValues can be a single shared spin or one spin per bet, otherwise all spins are drawn in one call, from Source
+# (a PCG64Source of Roulette_RNG.py, so the spins can be logged and replayed) or from a NumPy Generator (not logged).
+# When Record is true the credits are written to the ledger for the matching Usernames in a single transaction,
+# if any of them fails the whole batch is rolled back and the error raised (a BetError for a balance not covering its bet).
+def settle_batch(Usernames, BetTypes, Guesses, Bets, RandValues=None, Generator=None, Record=False, Source=None):
+    np = load_numpy()
+    BetCodes = encode_bet_types(BetTypes)
+    GuessValues = encode_guesses(BetCodes, Guesses)
+    Bets = np.asarray(Bets)
+    if not BetCodes.shape == GuessValues.shape == Bets.shape:
+        raise ValueError('BetTypes, Guesses and Bets should have the same length')
+    #Every recorded bet needs its player, checked before any spin is drawn (zip would leave the extra bets out of the ledger)
+    if Record and (Usernames is None or len(Usernames) != Bets.size):
+        raise ValueError('Usernames should have one player per bet to record the batch')
+
+    Errors = dict()
+    BadGuesses = np.flatnonzero(GuessValues < 0)
+    if BadGuesses.size:
+        Errors['guess'] = f'*Invalid guess for its bet option at rows {BadGuesses[:10].tolist()}'
+    #Bets are integer cents, a float array (e.g. dollars) is refused rather than read as cents, an empty one has no type to check
+    if Bets.dtype.kind not in 'iu' and Bets.size:
+        raise BetError({'bet': f'*Bets should be an integer array of cents, not {Bets.dtype}'})
+    BadBets = np.flatnonzero(Bets <= 0)
+    if BadBets.size:
+        Errors['bet'] = f'*Bet should be a positive whole number of cents at rows {BadBets[:10].tolist()}'
+    if Errors:
+        raise BetError(Errors)
+    Bets = Bets.astype(np.int64)
+
+    First = None
+    if RandValues is None and Source is not None:
+        RandValues, First = Source.draw_array(Bets.size)
+    elif RandValues is None:
+        if Generator is None:
+            Generator = np.random.default_rng()
+        RandValues = Generator.integers(1, 37, size=Bets.shape, dtype=np.int16)
+    else:
+        #Spins given by the caller (a shared table spin or a replay) are only numbers the ball can land on
+        RandValues = np.asarray(RandValues)
+        if RandValues.dtype.kind not in 'iu' or (RandValues.size and (RandValues.min() < 1 or RandValues.max() > 36)):
+            raise ValueError('RandValues should be whole numbers from 1 to 36')
+        RandValues = np.broadcast_to(RandValues.astype(np.int16), Bets.shape)
+
+    #The outcome of every spin for its own bet option, in the same encoding as the guesses
+    Outcomes = np.choose(BetCodes, [RandValues, RandValues % 2, RandValues > 18])
+    Won = Outcomes == GuessValues
+
+    Multipliers = np.array([PAYOUTS[BetType] for BetType in BET_CODES], dtype=np.int64)
+    Credits = np.where(Won, Bets*Multipliers[BetCodes], Bets*-1)
+
+    if Record:
+        BetNames = list(BET_CODES)
+        with LedgerBatch(BatchSize=len(Credits) + 1) as Ledger:
+            #The spins of the batch get consecutive SpinIDs, one per bet
+            FirstID = write_spins(Source.Name, Source.Seed, First, RandValues) if First is not None else None
+            for i, (Username, BetCode, Credit, Bet) in enumerate(zip(Usernames, BetCodes.tolist(), Credits.tolist(), Bets.tolist())):
+                if not Ledger.insert_transaction(Username, Credit, BetNames[BetCode], SpinID=FirstID + i if FirstID is not None else None, Bet=Bet):
+                    raise BetError({'bet': f'*The balance of {Username} does not cover the bet at row {i}'})
+    return BatchResult(RandValues, Won, Credits)
@@ -0,0 +1,91 @@
+import argparse
+import csv
+import sys
+
+from datetime import datetime
+
+from Roulette_Database import EXPORT_COLUMNS, iter_history, open_database
+from Roulette_Money import format_amount
+
+"""
+Export of table History to a CSV or a Parquet file, for accounting and analysis outside of the software.
+The records are streamed from the database a batch at a time (see Roulette_Database.iter_history) and every batch is written
+before the next one is read, so exporting the history of the whole casino needs no more memory than exporting one player.
+        CSV      Credit in dollars with 2 decimals and TimeDate as local 'YYYY-MM-DD HH:MM:SS' text, like the history page
+        Parquet  columnar and compressed, Credit as whole cents (column CreditCents), TimeDate as a UTC timestamp,
+                 every batch is a row group (needs pyarrow)
+
+    python Roulette_Export.py history.parquet --username Hassan --from 2021-05-01 --to 2021-06-01 --bet-types odd_even high_low
+"""
+
+# Bet options accepted by --bet-types, 'credit' stands for the deposits and withdraws (no bet option)
+EXPORT_BET_TYPES = {'single_num': 'single_num', 'odd_even': 'odd_even', 'high_low': 'high_low', 'credit': None}
+
+# Open source, only needed for Parquet files
+def load_pyarrow():
+    try:
+        import pyarrow  #pip install pyarrow
+        import pyarrow.parquet
+    except ModuleNotFoundError:
+        raise ModuleNotFoundError('Parquet export needs pyarrow, please install it using\npip install pyarrow') from None
+    return pyarrow
+
+# Write the batches of rows to a CSV file (File can be a path or an open text file) and return the number of rows
+def export_csv(Batches, File):
+    Output = open(File, 'w', newline='') if isinstance(File, str) else File
+    try:
+        Writer = csv.writer(Output)
+        Writer.writerow(EXPORT_COLUMNS)
+        Count = 0
+        Credit = EXPORT_COLUMNS.index('Credit')
+        for Rows in Batches:
+            Writer.writerows((*Row[:Credit], format_amount(Row[Credit]), *Row[Credit + 1:]) for Row in Rows)
+            Count += len(Rows)
+        return Count
+    finally:
+        if Output is not File:
+            Output.close()
+
+# Write the batches of rows to a Parquet file, one row group per batch, and return the number of rows
+def export_parquet(Batches, Path):
+    pa = load_pyarrow()
+    Schema = pa.schema([('HistoryID', pa.int64()), ('Username', pa.string()), ('BetType', pa.string()),
+                        ('CreditCents', pa.int64()), ('TimeDate', pa.timestamp('s', tz='UTC')), ('SpinID', pa.int64())])
+    Count = 0
+    with pa.parquet.ParquetWriter(Path, Schema, compression='zstd') as Writer:
+        for Rows in Batches:
+            Columns = list(zip(*Rows))
+            Writer.write_batch(pa.RecordBatch.from_arrays([pa.array(Column, type=Field.type)
+                                                           for Column, Field in zip(Columns, Schema)], schema=Schema))
+            Count += len(Rows)
+    return Count
+
+# Export the History records matching the filters (see iter_history) to Path, as Parquet when it ends with .parquet,
+# as CSV otherwise ('-' writes the CSV to the standard output)
+def export_history(Path, Username=None, Start=None, End=None, BetTypes=None, BatchSize=10000):
+    if Path.endswith('.parquet'):
+        return export_parquet(iter_history(Username, Start, End, BetTypes, BatchSize), Path)
+    return export_csv(iter_history(Username, Start, End, BetTypes, BatchSize, LocalTime=True), sys.stdout if Path == '-' else Path)
+
+# A local 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS' date as epoch seconds
+def epoch(Text):
+    return int(datetime.fromisoformat(Text).timestamp())
+
+def main():
+    Parser = argparse.ArgumentParser(description='Export the history of the Roulette to a CSV or a Parquet file')
+    Parser.add_argument('path', help="the file to write, Parquet when it ends with .parquet, '-' writes CSV to the standard output")
+    Parser.add_argument('--username', help='only the history of this player')
+    Parser.add_argument('--from', dest='start', type=epoch, help='only records from this local date (included)')
+    Parser.add_argument('--to', dest='end', type=epoch, help='only records before this local date (excluded)')
+    Parser.add_argument('--bet-types', nargs='+', choices=list(EXPORT_BET_TYPES), help="only these bet options, 'credit' for deposits and withdraws")
+    Parser.add_argument('--batch', type=int, default=10000, help='rows read and written at once')
+    Parser.add_argument('--database', default='Roulette.db')
+    Arguments = Parser.parse_args()
+
+    open_database(Arguments.database)
+    BetTypes = [EXPORT_BET_TYPES[BetType] for BetType in Arguments.bet_types] if Arguments.bet_types else None
+    Count = export_history(Arguments.path, Arguments.username, Arguments.start, Arguments.end, BetTypes, Arguments.batch)
+    print(f'{Count} records exported', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
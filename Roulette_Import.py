@@ -0,0 +1,271 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+import Roulette_Password
+
+from Roulette_Database import REBUILD_STATS, connection, create_history_indexes, drop_history_indexes, open_database
+from Roulette_Engine import BET_CODES, settle_batch
+from Roulette_Money import AmountError, format_money, to_cents
+from Roulette_Password import hash_password, is_hashed
+from Roulette_Validation import validate_bet, validate_registration
+
+"""
+Bulk import of players and transactions into Roulette.db, to seed a test database or to recover one from an export.
+Calling insert_player and insert_transaction for every row commits every row on its own, the import instead:
+        1-Reads the rows from CSV files (with a header) or JSONL files (one JSON object per line), a batch at a time
+        2-Writes every batch with executemany, the whole file in a single transaction (nothing is imported when a row fails)
+        3-Drops the indexes of table History once more than a batch of transactions is coming and builds them again at the end,
+          small imports keep updating the indexes as rebuilding them for the whole table would take longer
+        4-Reconciles the balances in one pass: the credits of the imported transactions are added up per player and
+          added to the balances ('apply', like insert_transaction would) or the balances are recomputed from the whole History
+          ('ledger'), then every player whose balance differs from the sum of their History is reported
+        5-Rebuilds the totals of table PlayerStats of the players with imported transactions
+Players need the fields of table Players (Balance is optional), with --validate the players breaking the rules of the
+Registration page (see Roulette_Validation.py) are left out and reported with their error codes.
+Passwords can be hashes (e.g. from another Roulette.db) or plain text, plain text passwords are hashed by the import with the
+current cost (see Roulette_Password.py) before they are written. Hashing is by far the slowest step, it is spread over a pool
+of processes (--workers) in chunks of HASH_CHUNK passwords. Transactions need Username and Credit, BetType and TimeDate
+(epoch seconds or local 'YYYY-MM-DD HH:MM:SS', e.g. from Roulette_Export.py) are optional. A bet can also be given
+without Credit but with Bet, Guess and RandValue, it is then settled (replayed) with the batch settlement.
+Balance, Credit and Bet are in dollars (e.g. 10.5) like the CSV export, and are stored as cents; an amount with
+a fraction of a cent fails the import. A row that can not be imported (a missing field, an amount, a TimeDate, or the BetType,
+Bet, Guess or RandValue of a replayed bet that is not valid) fails the import with a RowError naming the row and the field,
+rows are numbered from 1 in every file, the header of a CSV file not counted.
+
+    python Roulette_Import.py --players players.csv --transactions history.jsonl --database Test.db
+"""
+
+PLAYER_COLUMNS = ('Username', 'Password', 'Email', 'Forename', 'Surname', 'Birth', 'Balance')
+
+# Passwords hashed by one task of the pool of processes
+HASH_CHUNK = 64
+
+# The fields a replayed bet (a transaction without Credit) needs, and the codes of validate_bet by field
+REPLAY_COLUMNS = ('BetType', 'Bet', 'Guess', 'RandValue')
+BET_FIELDS = {'bet': 'Bet', 'guess': 'Guess'}
+
+# Raised for a row of a file that can not be imported, Number is the row in the file and Field the column at fault
+class RowError(ValueError):
+    def __init__(self, Number, Field, Problem):
+        super().__init__(f'row {Number}, {Field} {Problem}')
+        self.Number = Number
+        self.Field = Field
+
+# Every row of a CSV or JSONL file as a dict, empty CSV fields are None
+def read_rows(Path):
+    with open(Path, newline='') as File:
+        if Path.endswith(('.jsonl', '.json')):
+            for Line in File:
+                if Line.strip():
+                    yield json.loads(Line)
+        else:
+            for Row in csv.DictReader(File):
+                yield {Name: (Value if Value != '' else None) for Name, Value in Row.items()}
+
+# Split the rows into lists of at most Size rows, each with the number of its first row
+def batches(Rows, Size):
+    Rows = iter(Rows)
+    First = 1
+    while Batch := list(islice(Rows, Size)):
+        yield First, Batch
+        First += len(Batch)
+
+# The cents of the amount in the field of the row, raises RowError when it is not an amount
+def row_cents(Row, Number, Field):
+    try:
+        return to_cents(Row.get(Field))
+    except AmountError as Error:
+        raise RowError(Number, Field, Error) from None
+
+# TimeDate of an imported transaction as epoch seconds
+def epoch(TimeDate, Now):
+    if TimeDate is None:
+        return Now
+    try:
+        return int(TimeDate)
+    except ValueError:
+        return int(datetime.fromisoformat(TimeDate).timestamp())
+
+# Hash the passwords with the given cost, run by the processes of the pool which do not share the cost of the importer
+def hash_passwords(Passwords, Cost):
+    if Roulette_Password.Cost != Cost:
+        Roulette_Password.set_cost(Cost)
+    return [hash_password(Password) for Password in Passwords]
+
+# Replace the plain text passwords of the rows by their hash, with Pool (a ProcessPoolExecutor) when given
+def hash_row_passwords(Batch, Pool=None):
+    Plain = [Row for Row in Batch if Row.get('Password') is not None and not is_hashed(str(Row['Password']))]
+    Chunks = [[str(Row['Password']) for Row in Plain[i:i + HASH_CHUNK]] for i in range(0, len(Plain), HASH_CHUNK)]
+    Hashed = (Pool.map if Pool is not None else map)(hash_passwords, Chunks, [Roulette_Password.Cost]*len(Chunks))
+    for Start, Hashes in zip(range(0, len(Plain), HASH_CHUNK), Hashed):
+        for Row, Hash in zip(Plain[Start:Start + HASH_CHUNK], Hashes):
+            Row['Password'] = Hash
+
+# Add the players of the rows, players that already exist are left as they are, return the number added
+# When Rejected is a list the rows failing the registration rules are not added but appended to it as (Username, Errors)
+# Plain text passwords are hashed (see hash_row_passwords) after the rules are checked
+def import_players(Rows, BatchSize=100000, Rejected=None, Pool=None):
+    c = connection().cursor()
+    Count = 0
+    for First, Batch in batches(Rows, BatchSize):
+        Numbers = range(First, First + len(Batch))
+        if Rejected is not None:
+            Valid = []
+            ValidNumbers = []
+            for Number, Row in zip(Numbers, Batch):
+                Errors = validate_registration(*[Row.get(Column) for Column in PLAYER_COLUMNS[:-1]])
+                #The rules of a password can only be checked before it is hashed
+                if Row.get('Password') and is_hashed(Row['Password']):
+                    Errors.pop('password', None)
+                if Errors:
+                    Rejected.append((Row.get('Username'), Errors))
+                else:
+                    Valid.append(Row)
+                    ValidNumbers.append(Number)
+            Batch, Numbers = Valid, ValidNumbers
+        hash_row_passwords(Batch, Pool)
+        c.executemany("INSERT OR IGNORE INTO Players VALUES(?, ?, ?, ?, ?, ?, ?)",
+                      [[Row.get(Column) for Column in PLAYER_COLUMNS[:-1]] + [row_cents(Row, Number, 'Balance') if Row.get('Balance') is not None else 0]
+                       for Number, Row in zip(Numbers, Batch)])
+        Count += c.rowcount
+    return Count
+
+# The BetType, Guess, Bet in cents and RandValue of a replayed bet, raises RowError for the first field that is missing or invalid
+def replay_row(Row, Number):
+    for Field in REPLAY_COLUMNS:
+        if Row.get(Field) is None:
+            raise RowError(Number, Field, 'is missing, a transaction without Credit is a bet to replay')
+    if not isinstance(Row['BetType'], str) or Row['BetType'] not in BET_CODES:
+        raise RowError(Number, 'BetType', f"{Row['BetType']} is not a bet option")
+    Bet, Guess, Errors = validate_bet(Row['BetType'], Row['Bet'], Row['Guess'])
+    for Field, Code in Errors.items():
+        raise RowError(Number, BET_FIELDS[Field], f'is invalid ({Code})')
+    #At most 2 digits so a long text is never read by int()
+    RandValue = str(Row['RandValue']).strip()
+    if not (RandValue.isdecimal() and len(RandValue) <= 2 and 1 <= int(RandValue) <= 36):
+        raise RowError(Number, 'RandValue', 'should be a number from 1 to 36')
+    return Row['BetType'], Guess, Bet, int(RandValue)
+
+# The credits in cents of a batch of transactions, First is the number of its first row,
+# the rows without a credit are settled from their Bet, Guess and RandValue
+def batch_credits(Batch, First=1):
+    Credits = [row_cents(Row, Number, 'Credit') if Row.get('Credit') is not None else None
+               for Number, Row in enumerate(Batch, First)]
+    Replayed = [i for i, Credit in enumerate(Credits) if Credit is None]
+    if Replayed:
+        BetTypes, Guesses, Bets, RandValues = zip(*[replay_row(Batch[i], First + i) for i in Replayed])
+        Result = settle_batch(None, list(BetTypes), [str(Guess) for Guess in Guesses], list(Bets), RandValues=list(RandValues))
+        for i, Credit in zip(Replayed, Result.Credits.tolist()):
+            Credits[i] = Credit
+    return Credits
+
+# The row of table History of an imported transaction, raises RowError when Username or TimeDate is not valid
+def history_row(Row, Number, Credit, Now):
+    if not Row.get('Username'):
+        raise RowError(Number, 'Username', 'is missing')
+    try:
+        TimeDate = epoch(Row.get('TimeDate'), Now)
+    except (ValueError, TypeError):
+        raise RowError(Number, 'TimeDate', "should be epoch seconds or 'YYYY-MM-DD HH:MM:SS'") from None
+    return Row['Username'], Credit, Row.get('BetType'), TimeDate
+
+# Add the transactions of the rows to table History without touching the balances,
+# return the number added and whether the indexes were dropped (the caller builds them again)
+def import_transactions(Rows, BatchSize=100000):
+    c = connection().cursor()
+    Now = int(time.time())
+    Count = 0
+    Deferred = False
+    for First, Batch in batches(Rows, BatchSize):
+        if Count and not Deferred:
+            drop_history_indexes()
+            Deferred = True
+        c.executemany("INSERT INTO History (Username, Credit, BetType, TimeDate) VALUES(?, ?, ?, ?)",
+                      [history_row(Row, Number, Credit, Now)
+                       for Number, (Row, Credit) in enumerate(zip(Batch, batch_credits(Batch, First)), First)])
+        Count += len(Batch)
+    return Count, Deferred
+
+# Bring the balances and the totals of the players with transactions after FirstID in line with table History (see Mode above)
+# and return the players whose balance still differs from the sum of their History as (Username, Balance, Ledger)
+def reconcile_balances(FirstID, Mode='apply'):
+    c = connection().cursor()
+    c.execute("DROP TABLE IF EXISTS temp.ImportCredits")
+    c.execute("""CREATE TEMP TABLE ImportCredits AS SELECT Username, SUM(Credit) AS Credit FROM History
+                 WHERE HistoryID >= :FirstID GROUP BY Username""", {'FirstID':FirstID})
+    if Mode == 'apply':
+        c.execute("""UPDATE Players SET Balance = Balance + (SELECT Credit FROM ImportCredits WHERE ImportCredits.Username = Players.Username)
+                     WHERE Username IN (SELECT Username FROM ImportCredits)""")
+    else:
+        c.execute("""UPDATE Players SET Balance = (SELECT SUM(Credit) FROM History WHERE History.Username = Players.Username)
+                     WHERE Username IN (SELECT Username FROM ImportCredits)""")
+    Mismatches = c.execute("""SELECT Players.Username, Balance, (SELECT SUM(Credit) FROM History WHERE History.Username = Players.Username) AS Ledger
+                              FROM Players JOIN ImportCredits ON ImportCredits.Username = Players.Username
+                              WHERE Balance != Ledger""").fetchall()
+    c.execute(REBUILD_STATS.format(Where="WHERE Players.Username IN (SELECT Username FROM ImportCredits)"))
+    c.execute("DROP TABLE temp.ImportCredits")
+    return Mismatches
+
+# Import the files in a single transaction and return (players added, transactions added, balance mismatches, players rejected),
+# the players are only validated (and can be rejected) when Validate is true. Their plain text passwords are hashed
+# by Workers processes, in the importing process when Workers is 0
+def bulk_import(PlayersPath=None, TransactionsPath=None, BatchSize=100000, Mode='apply', Validate=False, Workers=None):
+    conn = connection()
+    Players = Transactions = 0
+    Mismatches = []
+    Rejected = [] if Validate else None
+    with conn:
+        if PlayersPath and Workers == 0:
+            Players = import_players(read_rows(PlayersPath), BatchSize, Rejected)
+        elif PlayersPath:
+            #The processes are only started when the first passwords are hashed
+            with ProcessPoolExecutor(max_workers=Workers) as Pool:
+                Players = import_players(read_rows(PlayersPath), BatchSize, Rejected, Pool)
+        if TransactionsPath:
+            FirstID = conn.execute("SELECT COALESCE(MAX(HistoryID), 0) + 1 FROM History").fetchone()[0]
+            Transactions, Deferred = import_transactions(read_rows(TransactionsPath), BatchSize)
+            if Deferred:
+                create_history_indexes()
+            Mismatches = reconcile_balances(FirstID, Mode)
+    return Players, Transactions, Mismatches, Rejected or []
+
+def main():
+    Parser = argparse.ArgumentParser(description='Bulk import of players and transactions into the Roulette database')
+    Parser.add_argument('--players', help='CSV or JSONL file of players')
+    Parser.add_argument('--transactions', help='CSV or JSONL file of transactions')
+    Parser.add_argument('--batch', type=int, default=100000, help='rows written by one executemany')
+    Parser.add_argument('--balances', choices=('apply', 'ledger'), default='apply',
+                        help="'apply' adds the imported credits to the balances, 'ledger' sets the balances to the sum of History")
+    Parser.add_argument('--validate', action='store_true', help='leave out the players breaking the rules of the Registration page')
+    Parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes hashing the plain text passwords, 0 for none')
+    Parser.add_argument('--database', default='Roulette.db')
+    Arguments = Parser.parse_args()
+
+    open_database(Arguments.database)
+    Start = time.perf_counter()
+    try:
+        Players, Transactions, Mismatches, Rejected = bulk_import(Arguments.players, Arguments.transactions, Arguments.batch,
+                                                                  Arguments.balances, Arguments.validate, Arguments.workers)
+    except sqlite3.IntegrityError as Error:
+        sys.exit(f'Nothing was imported: {Error} (every transaction needs an existing player and the balances can not go below 0)')
+    except RowError as Error:
+        sys.exit(f'Nothing was imported: {Error}')
+    Seconds = time.perf_counter() - Start
+    print(f'{Players} players and {Transactions} transactions imported in {Seconds:.1f}s '
+          f'({(Players + Transactions) / Seconds * 60:,.0f} rows/min)')
+    for Username, Errors in Rejected:
+        print(f'{Username}: not imported, ' + ', '.join(f'{Field} {Code}' for Field, Code in Errors.items()), file=sys.stderr)
+    for Username, Balance, Ledger in Mismatches:
+        print(f'{Username}: balance {format_money(Balance)} but the sum of the history is {format_money(Ledger)}', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+"""
+Opt-in instrumentation of the hot path of a bet, from the click on the bet button to the update of the balance label.
+Every stage is timed into its own histogram:
+        validation      parse_bet, checking the bet amount and the guess
+        rng             drawing the spin
+        update_balance  the UPDATE of the balance in table Players
+        spin_log        the INSERT of the spin in table SpinLog
+        history_insert  the INSERT of the record in table History
+        stats           the update of the totals in table PlayerStats
+        commit          the commit of the transaction (the wait for the disk)
+        balance_read    reading the record of the player again after the session was invalidated
+        widget_update   updating the labels of the Game page
+        bet             the whole bet, from the click to the updated labels
+Nothing is recorded until enable() is called, timed() then costs a call and two reads of the clock.
+A histogram keeps counts in buckets growing by 1/8 of a power of two (at most 12.5% error on a percentile),
+so recording is constant time and memory whatever the number of bets.
+
+Enabled by the GUI and the table server from the environment (see configure_from_environment):
+        ROULETTE_METRICS=1              record the timings (implied by the two below)
+        ROULETTE_METRICS_FILE=path      write the summary as JSON to the file when the software exits
+        ROULETTE_METRICS_PORT=9100      serve the summary on http://127.0.0.1:9100/metrics (Prometheus text) and /metrics.json
+"""
+
+STAGES = ('validation', 'rng', 'spin_log', 'update_balance', 'history_insert', 'stats', 'commit', 'balance_read', 'widget_update', 'bet')
+
+# Sub buckets per power of two, 2**SUB_BITS of them
+SUB_BITS = 3
+
+# Bucket of a duration in nanoseconds: the value itself below 2**(SUB_BITS + 1), then the top SUB_BITS + 1 bits and the power of two
+def bucket(Nanoseconds):
+    Shift = max(Nanoseconds.bit_length() - SUB_BITS - 1, 0)
+    return (Shift << SUB_BITS) + (Nanoseconds >> Shift)
+
+# The smallest duration in nanoseconds of a bucket
+def bucket_floor(Bucket):
+    if Bucket < 2 << SUB_BITS:
+        return Bucket
+    Shift = (Bucket >> SUB_BITS) - 1
+    return (Bucket - (Shift << SUB_BITS)) << Shift
+
+class Histogram:
+    def __init__(self):
+        self.Counts = [0]*(64 << SUB_BITS)
+        self.Count = 0
+        self.Total = 0
+        self.Max = 0
+        self.Lock = threading.Lock()
+
+    def record(self, Nanoseconds):
+        with self.Lock:
+            self.Counts[bucket(Nanoseconds)] += 1
+            self.Count += 1
+            self.Total += Nanoseconds
+            if Nanoseconds > self.Max:
+                self.Max = Nanoseconds
+
+    # The duration in nanoseconds below which a fraction Quantile of the recorded durations are, middle of its bucket
+    def percentile(self, Quantile):
+        Rank = Quantile*self.Count
+        Seen = 0
+        for Bucket, Count in enumerate(self.Counts):
+            Seen += Count
+            if Count and Seen >= Rank:
+                return min((bucket_floor(Bucket) + bucket_floor(Bucket + 1)) / 2, self.Max)
+        return 0
+
+    # Count, mean, p50, p99 and max in milliseconds
+    def summary(self):
+        return {'count': self.Count, 'mean_ms': self.Total / self.Count / 1e6 if self.Count else 0,
+                'p50_ms': self.percentile(0.5) / 1e6, 'p99_ms': self.percentile(0.99) / 1e6, 'max_ms': self.Max / 1e6}
+
+Enabled = False
+Histograms = dict()
+
+def enable():
+    global Enabled
+    Enabled = True
+
+def disable():
+    global Enabled
+    Enabled = False
+
+def reset():
+    Histograms.clear()
+
+def record(Stage, Nanoseconds):
+    Times = Histograms.get(Stage)
+    if Times is None:
+        Times = Histograms.setdefault(Stage, Histogram())
+    Times.record(Nanoseconds)
+
+# Times the with block into the histogram of the stage
+class Timer:
+    __slots__ = ('Stage', 'Start')
+
+    def __init__(self, Stage):
+        self.Stage = Stage
+
+    def __enter__(self):
+        self.Start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, ErrorType, Error, Traceback):
+        record(self.Stage, time.perf_counter_ns() - self.Start)
+
+# Does nothing, returned by timed while the instrumentation is disabled
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ErrorType, Error, Traceback):
+        pass
+
+NULL_TIMER = NullTimer()
+
+#    with timed('commit'):
+#        conn.commit()
+def timed(Stage):
+    return Timer(Stage) if Enabled else NULL_TIMER
+
+# For a stage starting on one thread and ending on another (e.g. a bet settled by the ledger writer):
+# Start = started() where it begins and finished(Stage, Start) where it ends
+def started():
+    return time.perf_counter_ns() if Enabled else None
+
+def finished(Stage, Start):
+    if Start is not None:
+        record(Stage, time.perf_counter_ns() - Start)
+
+# The summary of every stage that was recorded, in the order of STAGES
+def summary():
+    Order = {Stage: i for i, Stage in enumerate(STAGES)}
+    return {Stage: Histograms[Stage].summary() for Stage in sorted(Histograms, key=lambda Stage: (Order.get(Stage, len(Order)), Stage))}
+
+def dump(Path):
+    with open(Path, 'w') as File:
+        json.dump({'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'stages': summary()}, File, indent=2)
+
+# The summary in the Prometheus text format
+def prometheus():
+    Lines = ['# TYPE roulette_stage_seconds summary']
+    for Stage, Summary in summary().items():
+        Lines.append(f'roulette_stage_seconds{{stage="{Stage}",quantile="0.5"}} {Summary["p50_ms"] / 1000:.9f}')
+        Lines.append(f'roulette_stage_seconds{{stage="{Stage}",quantile="0.99"}} {Summary["p99_ms"] / 1000:.9f}')
+        Lines.append(f'roulette_stage_seconds_sum{{stage="{Stage}"}} {Summary["mean_ms"]*Summary["count"] / 1000:.9f}')
+        Lines.append(f'roulette_stage_seconds_count{{stage="{Stage}"}} {Summary["count"]}')
+    return '\n'.join(Lines) + '\n'
+
+# Serve the metrics on the local machine from a daemon thread and return the server
+# http.server is only imported here as it takes longer to import than the rest of this module
+def serve(Port=9100, Host='127.0.0.1'):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                Body, Type = prometheus().encode(), 'text/plain; version=0.0.4'
+            elif self.path == '/metrics.json':
+                Body, Type = json.dumps(summary()).encode(), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', Type)
+            self.send_header('Content-Length', str(len(Body)))
+            self.end_headers()
+            self.wfile.write(Body)
+
+        def log_message(self, Format, *Arguments):
+            pass
+
+    Server = ThreadingHTTPServer((Host, Port), MetricsHandler)
+    threading.Thread(target=Server.serve_forever, name='Metrics', daemon=True).start()
+    return Server
+
+# Enable the instrumentation, the dump and the endpoint asked for by the environment variables above
+def configure_from_environment():
+    if os.environ.get('ROULETTE_METRICS', '0') in ('', '0') and not os.environ.get('ROULETTE_METRICS_FILE') \
+       and not os.environ.get('ROULETTE_METRICS_PORT'):
+        return
+    enable()
+    if os.environ.get('ROULETTE_METRICS_FILE'):
+        atexit.register(dump, os.environ['ROULETTE_METRICS_FILE'])
+    if os.environ.get('ROULETTE_METRICS_PORT'):
+        serve(int(os.environ['ROULETTE_METRICS_PORT']))
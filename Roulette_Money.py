@@ -0,0 +1,76 @@
+import re
+
+from decimal import Decimal, InvalidOperation
+
+"""
+Amounts of money are held as whole numbers of cents everywhere below the user interface: the balances in table Players,
+the credits in table History, the totals in table PlayerStats, the bets of the engine and the arrays of the batch settlement.
+Sums of cents are exact, so SUM(Credit) over the History of a player is exactly its balance, which sums of floats
+(e.g. 0.1 + 0.2) are not. Amounts are only converted at the edges:
+        to_cents      what the player typed (or a CSV/JSON field) to cents, exactly, refusing fractions of a cent
+        format_money  cents to the text shown by the pages, e.g. 1050 -> '$10.50' and -5 -> '-$0.05'
+        format_amount the same without the dollar sign, e.g. for CSV files, to_cents reads it back exactly
+        from_cents    cents to dollars as a number, for JSON and for reports
+
+    to_cents('10.5')   #1050
+"""
+
+CENTS = 100
+CENT = Decimal('0.01')
+
+# Amounts have at most 15 digits of dollars, so cents always fit the 64 bits INTEGER of SQLite and int() never reads
+# a text longer than the digit limit of Python
+MAX_DIGITS = 15
+MAX_CENTS = 10**MAX_DIGITS*CENTS - 1
+
+# What is typed most of the time, e.g. '10', '-3.5' or '0.25', read without Decimal
+AMOUNT = re.compile(rf'([+-]?)(\d{{1,{MAX_DIGITS}}})(?:\.(\d{{1,2}}))?')
+
+# Raised by to_cents, Code is 'not_numeric', 'too_many_decimals' or 'too_large' (see Roulette_Validation.py)
+class AmountError(ValueError):
+    def __init__(self, Message, Code):
+        super().__init__(Message)
+        self.Code = Code
+
+# The number of cents in Amount, a number or a text of dollars, raises AmountError when it is not numeric,
+# not a whole number of cents or has more than MAX_DIGITS digits of dollars
+def to_cents(Amount):
+    if isinstance(Amount, bool):
+        raise AmountError('should be numeric', 'not_numeric')
+    if isinstance(Amount, int):
+        if abs(Amount) > MAX_CENTS // CENTS:
+            raise AmountError('is too large', 'too_large')
+        return Amount*CENTS
+    if isinstance(Amount, str):
+        Amount = Amount.strip()
+        Match = AMOUNT.fullmatch(Amount)
+        if Match:
+            Sign, Dollars, Cents = Match.groups()
+            Cents = int(Dollars)*CENTS + int((Cents or '0').ljust(2, '0'))
+            return -Cents if Sign == '-' else Cents
+    try:
+        Amount = Decimal(Amount if isinstance(Amount, str) else str(Amount))
+    except (InvalidOperation, TypeError):
+        raise AmountError('should be numeric', 'not_numeric') from None
+    if not Amount.is_finite():
+        raise AmountError('should be numeric', 'not_numeric')
+    #Checked on the exponent before any arithmetic, as a huge or tiny exponent (e.g. '1e999999') overflows the context of Decimal
+    if Amount.adjusted() >= MAX_DIGITS:
+        raise AmountError('is too large', 'too_large')
+    if Amount != Amount.quantize(CENT):
+        raise AmountError('can have at most 2 decimals', 'too_many_decimals')
+    return int(Amount*CENTS)
+
+# Cents as dollars, a float is exact enough for display and JSON but should not be summed
+def from_cents(Cents):
+    return Cents / CENTS
+
+# Cents as dollars text with exactly 2 decimals, Currency is written between the sign and the number
+def format_amount(Cents, Currency=''):
+    Sign = '-' if Cents < 0 else ''
+    Dollars, Cents = divmod(abs(int(Cents)), CENTS)
+    return f'{Sign}{Currency}{Dollars}.{Cents:02d}'
+
+# Cents as the text shown to the player
+def format_money(Cents):
+    return format_amount(Cents, '$')
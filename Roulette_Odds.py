@@ -0,0 +1,125 @@
+import argparse
+import math
+
+from fractions import Fraction
+from itertools import repeat
+from operator import add, mul
+
+from Roulette_Engine import outcome, parse_bet, payout
+from Roulette_Validation import GUESSES
+
+"""
+Exact odds of the bet options, the analytic counterpart of Roulette_Simulation.py.
+The wheel has 36 equally likely numbers, so everything can be computed exactly with fractions:
+        1-WIN_MASKS holds, for every bet option and every guess, which of the 36 numbers win (precomputed when imported)
+        2-The distribution of one spin for a strategy (one or more bets placed on the same spin) is read from the masks:
+          for every number the credits of the bets are added up, each number having a probability of 1/36
+        3-The distribution over many spins is the convolution of the one spin distribution with itself, one spin at a time.
+          Every credit of a spin is a whole multiple of a common unit, so the distribution is held as a list of whole numbers:
+          the number of ways (out of 36**spins) to end on each multiple of the unit, and each spin only shifts and adds that list
+A distribution is a dict {total credit: probability}, credits and probabilities are Fractions.
+
+    python Roulette_Odds.py --bet odd_even odd 5 --bet single_num 17 1 --spins 100 --level 0.99
+"""
+
+WHEEL = range(1, 37)
+
+# Whether each number of the wheel wins, for every (bet option, guess)
+WIN_MASKS = {(BetType, Guess): tuple(outcome(BetType, RandValue) == Guess for RandValue in WHEEL)
+             for BetType, Guesses in GUESSES.items() for Guess in Guesses}
+
+# Distribution of the total credit of the bets placed on one spin, every bet is (bet option, guess, stake)
+def spin_distribution(Bets):
+    Parsed = []
+    for BetType, Guess, Stake in Bets:
+        Guess = parse_bet(BetType, Stake, Guess)[1]
+        Parsed.append((BetType, Guess, Fraction(str(Stake))))
+
+    Distribution = dict()
+    for Number in range(len(WHEEL)):
+        Credit = sum((payout(BetType, Stake, WIN_MASKS[BetType, Guess][Number]) for BetType, Guess, Stake in Parsed), Fraction(0))
+        Distribution[Credit] = Distribution.get(Credit, 0) + Fraction(1, len(WHEEL))
+    return Distribution
+
+# Distribution of the sum of two independent credits
+def convolve(First, Second):
+    Distribution = dict()
+    for CreditA, ProbabilityA in First.items():
+        for CreditB, ProbabilityB in Second.items():
+            Credit = CreditA + CreditB
+            Distribution[Credit] = Distribution.get(Credit, 0) + ProbabilityA*ProbabilityB
+    return Distribution
+
+# The largest Fraction every credit is a whole multiple of
+def credit_unit(Credits):
+    Denominator = math.lcm(*(Credit.denominator for Credit in Credits))
+    return Fraction(math.gcd(*(int(Credit*Denominator) for Credit in Credits)), Denominator) or Fraction(1)
+
+# Distribution of the total credit of playing the same bets on Spins spins
+def strategy_distribution(Bets, Spins=1):
+    Spin = spin_distribution(Bets)
+    Unit = credit_unit(Spin)
+    #Every credit of one spin as a shift (in units, from the lowest credit) and the number of wheel numbers giving it
+    Lowest = min(Spin)
+    Shifts = [(int((Credit - Lowest) / Unit), int(Probability*len(WHEEL))) for Credit, Probability in Spin.items()]
+    Span = max(Shift for Shift, Ways in Shifts)
+
+    #Ways[i]: number of ways of ending on Spins*Lowest + i*Unit
+    Ways = [1]
+    for i in range(Spins):
+        Next = [0]*(len(Ways) + Span)
+        for Shift, Count in Shifts:
+            Next[Shift:Shift + len(Ways)] = map(add, Next[Shift:Shift + len(Ways)], map(mul, Ways, repeat(Count)))
+        Ways = Next
+
+    Total = len(WHEEL)**Spins
+    return {Spins*Lowest + i*Unit: Fraction(Count, Total) for i, Count in enumerate(Ways) if Count}
+
+def expected_value(Distribution):
+    return sum((Credit*Probability for Credit, Probability in Distribution.items()), Fraction(0))
+
+def variance(Distribution):
+    Mean = expected_value(Distribution)
+    return sum(((Credit - Mean)**2*Probability for Credit, Probability in Distribution.items()), Fraction(0))
+
+# Probability that the total credit is at most Credit, e.g. the probability of losing Limit or more is probability_at_most(D, -Limit)
+def probability_at_most(Distribution, Credit):
+    return sum((Probability for Value, Probability in Distribution.items() if Value <= Credit), Fraction(0))
+
+# Probability that the player ends with less than they started with
+def probability_of_loss(Distribution):
+    return sum((Probability for Value, Probability in Distribution.items() if Value < 0), Fraction(0))
+
+# The worst total credit reached with probability at least 1 - Level (value at risk), e.g. Level 0.99 gives the 1% worst case
+def value_at_risk(Distribution, Level):
+    Cumulative = Fraction(0)
+    for Credit in sorted(Distribution):
+        Cumulative += Distribution[Credit]
+        if Cumulative >= 1 - Fraction(str(Level)):
+            return Credit
+    return max(Distribution)
+
+def main():
+    Parser = argparse.ArgumentParser(description='Exact odds of a strategy of the Roulette')
+    Parser.add_argument('--bet', nargs=3, action='append', metavar=('BET_TYPE', 'GUESS', 'STAKE'),
+                        help='a bet placed on every spin, can be given more than once')
+    Parser.add_argument('--spins', type=int, default=1)
+    Parser.add_argument('--level', type=float, default=0.99, help='confidence level of the value at risk')
+    Arguments = Parser.parse_args()
+
+    #Without bets, show every bet option staking 1
+    Strategies = [[Bet] for Bet in Arguments.bet] if Arguments.bet else [[(BetType, Guesses[0], 1)] for BetType, Guesses in GUESSES.items()]
+    if Arguments.bet and len(Arguments.bet) > 1:
+        Strategies.append(Arguments.bet)
+
+    for Bets in Strategies:
+        Distribution = strategy_distribution(Bets, Arguments.spins)
+        Mean = expected_value(Distribution)
+        Variance = variance(Distribution)
+        Name = ' + '.join(f'{BetType} {Guess} x{Stake}' for BetType, Guess, Stake in Bets)
+        print(f'{Name} over {Arguments.spins} spin(s): EV {Mean} ({float(Mean):+.6f}), variance {Variance} ({float(Variance):.6f}), '
+              f'P(loss) {float(probability_of_loss(Distribution)):.6f}, '
+              f'value at risk {Arguments.level:.0%}: {float(value_at_risk(Distribution, Arguments.level)):+.2f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+import hashlib
+import hmac
+import os
+import secrets
+import sys
+import threading
+
+from collections import OrderedDict
+
+from Roulette_Database import get_player, update_password
+
+"""
+Passwords are stored as salted hashes in table Players, never as the password itself:
+        scrypt$<cost>$<r>$<p>$<salt>$<hash>          the default, memory hard, N = 2**cost
+        pbkdf2_sha256$<cost>$<salt>$<hash>           when hashlib is built without scrypt, 2**cost iterations
+The cost is the work factor: every step up doubles the time of a login, and the time of every guess of an attacker.
+It is ROULETTE_PASSWORD_COST when set to a cost within COST_LIMITS, otherwise DEFAULT_COSTS; pick it with the login latency target in mind,
+python Roulette_Benchmark.py password times every cost and recommends the highest one within the target.
+
+Logging in (check_login) reads the record of the player once and verifies the password against it:
+        1-An unknown username is verified against a dummy hash, so it takes as long as a wrong password
+          and the time of a login does not tell whether the username exists
+        2-Hashes are compared with hmac.compare_digest, in a time that does not depend on where they differ
+        3-A record made before passwords were hashed (a plain text password, registration always required an uppercase
+          letter so it can not look like a hash) or hashed with another cost is hashed again with the current one,
+          the record returned holds the new hash so the session does not read it again
+        4-A successful verification is remembered (VerifiedCache) as an HMAC of the password under a key drawn when the
+          software starts, so logging in again, e.g. from a second connection to the table server, skips the slow hash.
+          Failed attempts are never remembered, every guess pays the full cost
+"""
+
+DEFAULT_COSTS = {'scrypt': 14, 'pbkdf2_sha256': 19}
+ALGORITHM = 'scrypt' if hasattr(hashlib, 'scrypt') else 'pbkdf2_sha256'
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+
+# The parameters a stored hash can have, a hash outside of them is not verified (a corrupted or forged record
+# could otherwise make a login raise or hash for hours), the limits of scrypt keep its memory under 2 GiB
+COST_LIMITS = {'scrypt': range(10, 21), 'pbkdf2_sha256': range(10, 25)}
+SCRYPT_R_LIMITS = range(1, 17)
+SCRYPT_P_LIMITS = range(1, 5)
+
+# The cost set by ROULETTE_PASSWORD_COST, the default one when it is not set or not a cost within COST_LIMITS
+def environment_cost():
+    Text = os.environ.get('ROULETTE_PASSWORD_COST', '').strip()
+    if Text == '':
+        return DEFAULT_COSTS[ALGORITHM]
+    Limits = COST_LIMITS[ALGORITHM]
+    if Text.isdecimal() and len(Text) <= 2 and int(Text) in Limits:
+        return int(Text)
+    print(f'ROULETTE_PASSWORD_COST={Text} is not a cost of {ALGORITHM} from {Limits[0]} to {Limits[-1]}, '
+          f'using {DEFAULT_COSTS[ALGORITHM]}', file=sys.stderr)
+    return DEFAULT_COSTS[ALGORITHM]
+
+Cost = environment_cost()
+
+# Hash of a random password with the current cost, verified for unknown usernames, only made the first time it is needed
+# as hashing takes longer than importing the software
+DummyHash = None
+
+def set_cost(NewCost):
+    global Cost, DummyHash
+    if NewCost not in COST_LIMITS[ALGORITHM]:
+        raise ValueError(f'The cost of {ALGORITHM} should be from {COST_LIMITS[ALGORITHM][0]} to {COST_LIMITS[ALGORITHM][-1]}')
+    Cost = NewCost
+    DummyHash = None
+
+def dummy_hash():
+    global DummyHash
+    if DummyHash is None:
+        DummyHash = hash_password(secrets.token_hex(8))
+    return DummyHash
+
+# The derived key of the password for the parameters of a stored hash
+def derive(Password, Algorithm, Salt, Parameters):
+    if Algorithm == 'scrypt':
+        Work, R, P = Parameters
+        return hashlib.scrypt(Password.encode(), salt=Salt, n=2**Work, r=R, p=P, maxmem=2*128*R*P*2**Work)
+    return hashlib.pbkdf2_hmac('sha256', Password.encode(), Salt, 2**Parameters[0])
+
+# The hash of the password to store, with a new salt and the current cost
+def hash_password(Password, Algorithm=ALGORITHM):
+    Salt = secrets.token_bytes(SALT_BYTES)
+    Parameters = (Cost, SCRYPT_R, SCRYPT_P) if Algorithm == 'scrypt' else (Cost,)
+    Key = derive(Password, Algorithm, Salt, Parameters)
+    return '$'.join([Algorithm, *map(str, Parameters), Salt.hex(), Key.hex()])
+
+# Whether the parameters of a stored hash are within the limits above
+def within_limits(Algorithm, Parameters):
+    if Parameters[0] not in COST_LIMITS[Algorithm]:
+        return False
+    return Algorithm != 'scrypt' or (Parameters[1] in SCRYPT_R_LIMITS and Parameters[2] in SCRYPT_P_LIMITS)
+
+# The algorithm, salt, parameters and key of a stored hash, None for a plain text password or parameters out of the limits
+def parse_hash(Stored):
+    Fields = Stored.split('$')
+    try:
+        if Fields[0] == 'scrypt' and len(Fields) == 6:
+            Parsed = 'scrypt', bytes.fromhex(Fields[4]), tuple(map(int, Fields[1:4])), bytes.fromhex(Fields[5])
+        elif Fields[0] == 'pbkdf2_sha256' and len(Fields) == 4:
+            Parsed = 'pbkdf2_sha256', bytes.fromhex(Fields[2]), (int(Fields[1]),), bytes.fromhex(Fields[3])
+        else:
+            return None
+    except ValueError:
+        return None
+    return Parsed if within_limits(Parsed[0], Parsed[2]) else None
+
+def is_hashed(Stored):
+    return parse_hash(Stored) is not None
+
+# Whether the stored password was hashed with the current algorithm and cost
+def is_current(Stored):
+    Parsed = parse_hash(Stored)
+    return Parsed is not None and Parsed[0] == ALGORITHM and Parsed[2][0] == Cost
+
+# Successful verifications by stored hash, at most CACHE_SIZE of them, the least recently used is dropped first
+CACHE_SIZE = 1024
+CACHE_KEY = secrets.token_bytes(32)
+VerifiedCache = OrderedDict()
+CacheLock = threading.Lock()
+
+def cache_digest(Password):
+    return hmac.new(CACHE_KEY, Password.encode(), hashlib.sha256).digest()
+
+# Whether the password matches the stored hash (or legacy plain text password)
+def verify_password(Password, Stored):
+    Digest = cache_digest(Password)
+    with CacheLock:
+        Cached = VerifiedCache.get(Stored)
+        if Cached is not None:
+            VerifiedCache.move_to_end(Stored)
+    if Cached is not None and hmac.compare_digest(Cached, Digest):
+        return True
+
+    Parsed = parse_hash(Stored)
+    if Parsed is None:
+        #Plain text, still run one hash so it takes as long as a hashed password
+        derive(Password, *parse_hash(dummy_hash())[:3])
+        Valid = hmac.compare_digest(Password.encode(), Stored.encode())
+    else:
+        Algorithm, Salt, Parameters, Key = Parsed
+        Valid = hmac.compare_digest(derive(Password, Algorithm, Salt, Parameters), Key)
+
+    if Valid and Parsed is not None:
+        with CacheLock:
+            VerifiedCache[Stored] = Digest
+            if len(VerifiedCache) > CACHE_SIZE:
+                VerifiedCache.popitem(last=False)
+    return Valid
+
+# Verify the login of a player with a single read of table Players and return (Record, Valid),
+# Record is None when the username does not exist. A valid password not hashed with the current cost is hashed again
+# and Record holds the new hash
+def check_login(Username, Password):
+    Rows = get_player(Username)
+    if len(Rows) == 0:
+        verify_password(Password, dummy_hash())
+        return None, False
+    Record = Rows[0]
+    if not verify_password(Password, Record[1]):
+        return Record, False
+    if not is_current(Record[1]):
+        Stored = hash_password(Password)
+        update_password(Username, Stored)
+        Record = (*Record[:1], Stored, *Record[2:])
+    return Record, True
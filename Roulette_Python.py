@@ -1,268 +1,105 @@
 #Last edit: 19/05/21
-import operator
-import re
-import sqlite3
+import queue
 
 from datetime import date, datetime
-from random import randint
 from tkinter import *
 from tkinter import messagebox
 from tkinter import ttk  #Treeview and style are a ttk widgets therefore we need to import them as ttk
 
-#Open source
-try:
-    from PIL import ImageTk, Image    #pip install Pillow
-    from tkcalendar import Calendar  #pip install tkcalendar
-except ModuleNotFoundError:
-    print('Please install the required modules using\npip install Pillow\npip install tkcalendar ')
-    quit()
-
-"""
-Create a database with the name Roulete, it contains two tables Players and History and they have one-to-many relationship respectively.
-Table Players will store the data of players while table History will store any transactions such as deposit, widthraw or betting rewards.
-The foreign key is field Username in History and it refers to field Username in Players as a primary key.
-
-Each field within the tables is assigned with data type and sometimes a Validation
-for example, Balance in table Players is a Real number (floating) and has two validations: Not empty and greater than or equal to 0.
-Sqlite3 code is easy to understand as it has many similarities with other RDBMS.
-"""
-conn = sqlite3.connect('Roulette.db')
-conn.execute("PRAGMA foreign_keys = 1")
-c = conn.cursor()
-
-c.execute(""" CREATE TABLE IF NOT EXISTS Players (
-        Username  TEXT UNIQUE NOT NULL,
-        Password  TEXT NOT NULL,
-        Email     TEXT NOT NULL,
-        Forename  TEXT,
-        Surname   TEXT,
-        Birth     TEXT,
-        Balance   REAL NOT NULL DEFAULT 0,
-        CHECK(Balance >= 0),
-        PRIMARY KEY(Username)
-            )""")
-
-c.execute(""" CREATE TABLE IF NOT EXISTS History(
-        Username  TEXT NOT NULL,
-        Credit    REAL NOT NULL,
-        BetType   TEXT,
-        TimeDate  TEXT,
-        FOREIGN KEY (Username) REFERENCES Players (Username)
-            )""")
-
-"""
-The following functions are used to interact with the database such as adding new records or retrieve/query a specific record.
-Notice that Python variables are not added directly but instead in a form of dictionary, and this is to prevent bad input
-and hence a SQL injection attack.
-"""
-
-# Add and register a new player to table Players
-def insert_player(Username, Password, Email, Forename, Surname, Birth, Balance=0):
-    with conn:
-        c.execute("INSERT INTO Players Values(:Username, :Password, :Email, :Forename, :Surname, :Birth, :Balance)",
-        {'Username':Username, 'Password':Password, 'Email':Email, 'Forename':Forename, 'Surname':Surname, 'Birth':Birth, 'Balance':Balance})
-
-# Update the balance of the specified username, in table Players, by adding the inserted credit
-def update_balance(Username, Credit):
-    with conn:
-        c.execute("""UPDATE Players SET Balance = Balance + :Credit
-                     WHERE Username=:Username
-        """, {'Username':Username, 'Credit':Credit})
-
-# Retrieve the specified username record in table Players and return the record as a list
-def get_player(Username):
-    c.execute("SELECT * FROM Players WHERE Username=:Username", {'Username':Username})
-    return c.fetchall()
-
-# Query the balance of the specified username by calling get_player function and extract the balance using list slicing
-def get_balance(Username):
-    return get_player(Username)[-1][-1]
-
-# call function update_balance then add a transaction as a record to table Hisotry
-def insert_transaction(Username, Credit, BetType=None):
-    update_balance(Username, Credit)
-    with conn:
-        c.execute("INSERT INTO History VALUES(:Username, :Credit, :BetType, datetime('now', 'localtime'))",
-        {'Username':Username, 'Credit':Credit, 'BetType': BetType})
-
-# Query all records in table History for the specified username and return them as a list of tuples
-# In other words, return all transactions for the specified username
-def get_history(Username):
-    c.execute("SELECT BetType, Credit, TimeDate FROM History WHERE Username=:Username", {'Username':Username})
-    return c.fetchall()
+from Roulette_Assets import background
+from Roulette_Database import insert_player, get_player, get_history_page
+from Roulette_Engine import BetError, parse_bet
+from Roulette_Metrics import configure_from_environment, finished, started, timed
+from Roulette_Money import format_money, to_cents
+from Roulette_Password import check_login, hash_password
+from Roulette_Session import Player
+from Roulette_Validation import messages, validate_registration
+from Roulette_Writer import LedgerWriter
 
 """
 The following functions represent the betting options.
-Every function has a similar process:
+Every function hands the bet to the settlement engine (Roulette_Engine.py) through the session of the player,
+the engine validates the bet, spins the wheel and writes the payout to the database, and then the function updates the GUI:
         0-Define label text variables in tkinter GUI as a global, so the variable can be called from other functions
-        1-Retrieve the bet amount (aka staked amount) and player guess which was inserted in tkinter GUI
-        2-Get a random number from 1 to 36 using randint in random library
-        3-if the inserted data does not matche the validations such as the amount user bets is not a number or player guess is invalid,
+        1-if the inserted data does not matche the validations such as the amount user bets is not a number or player guess is invalid,
         then create a label text in tkinter GUI informing the user to insert valid values
-        4-If validation is passed: The code will compare player guess with the random generated number
-        5-Depending on the comparison outcome,
-            1-the code will create a label text in tkinter GUI informing if player won or not and include the value of the random generated number
-            2-Call insert_transaction function to add the betting rewards or remove the stake from player balance
+        2-Otherwise the bet is queued to the ledger writer (Roulette_Writer.py) which settles it on its own thread,
+        so the window keeps responding while the bet is written, and bet_settled is called back on the GUI thread
+        3-bet_settled creates a label text in tkinter GUI informing if player won or not and include the value of the random generated number
 """
 
-#Single Number bet option
-def single_num(Username, Bet, UserGuess):
+#Validate the bet and queue it to the ledger writer, the outcome is shown in the Game page by bet_settled
+def place_bet(BetType, Bet, UserGuess):
     global UserBetValidationLabel
     global UserGuessValidationLabel
-    global ResultLabel
 
-    RandValue = randint(1, 36)
+    Start = started()
     try:
-        Bet = float(Bet)
-        UserGuess = int(UserGuess)
-
-        if UserGuess == RandValue:
-            insert_transaction(Username, Bet*36, 'single_num')
-            UserGuessEntry.delete(0, END)
-            UserBetEntry.delete(0, END)
-            ResultLabel = Label(Game, text=f'Congratulation, the ball landed on {RandValue}', font='Arial 18 bold', fg='#f00')
-            ResultLabel.place(x=400, y=250)
-
-        elif UserGuess in range(1, 37):
-            insert_transaction(Username, Bet*-1, 'single_num')
-            UserGuessEntry.delete(0, END)
-            UserBetEntry.delete(0, END)
-            ResultLabel = Label(Game, text=f'Sorry, the ball landed on {RandValue}', font='Arial 18 bold', fg='#f00')
-            ResultLabel.place(x=400, y=250)
+        parse_bet(BetType, Bet, UserGuess)
+        Writer.submit(Session.settle, BetType, Bet, UserGuess, Callback=lambda Result, Error: bet_settled(Result, Error, Start))
 
-        else:
-            UserGuessEntry.delete(0, END)
-            UserGuessValidationLabel = Label(UserBetFrame, text="*You can choose only from 1 to 36, try again", fg="#f00")
-            UserGuessValidationLabel.grid(row=0, column=2)
+    except queue.Full:
+        UserBetValidationLabel = Label(UserBetFrame, text="*Too many bets are waiting, please wait", fg="#f00")
+        UserBetValidationLabel.grid(row=1, column=2)
+        return
 
-    except ValueError:
-        if not UserGuess.isdigit():
+    except BetError as Error:
+        if 'guess' in Error.Errors:
             UserGuessEntry.delete(0, END)
-            UserGuessValidationLabel = Label(UserBetFrame, text="*You can choose only from 1 to 36", fg="#f00")
+            UserGuessValidationLabel = Label(UserBetFrame, text=Error.Errors['guess'], fg="#f00")
             UserGuessValidationLabel.grid(row=0, column=2)
 
-        if not str(Bet).replace('.', '', 1).isdigit():
+        if 'bet' in Error.Errors:
             UserBetEntry.delete(0, END)
-            UserBetValidationLabel = Label(UserBetFrame, text="*Bet should be numeric", fg="#f00")
+            UserBetValidationLabel = Label(UserBetFrame, text=Error.Errors['bet'], fg="#f00")
             UserBetValidationLabel.grid(row=1, column=2)
+        return
 
-#Odd or Even bet option
-def odd_even(Username, Bet, UserGuess):
-    global UserBetValidationLabel
-    global UserGuessValidationLabel
-    global ResultLabel
-
-    RandValue = randint(1, 36)
-    try:
-        Bet = float(Bet)
-        UserGuess = UserGuess.lower()
-
-        if UserGuess == ('even' if RandValue % 2 == 0 else 'odd'):
-            insert_transaction(Username, Bet*2, 'odd_even')
-            UserGuessEntry.delete(0, END)
-            UserBetEntry.delete(0, END)
-            ResultLabel = Label(Game, text=f'Congratulation, the ball landed on {RandValue}', font='Arial 18 bold', fg='#f00')
-            ResultLabel.place(x=400, y=250)
+    UserGuessEntry.delete(0, END)
+    UserBetEntry.delete(0, END)
 
-        elif UserGuess in ('even', 'odd'):
-            insert_transaction(Username, Bet*-1, 'odd_even')
-            UserGuessEntry.delete(0, END)
-            UserBetEntry.delete(0, END)
-            ResultLabel = Label(Game, text=f'Sorry, the ball landed on {RandValue}', font='Arial 18 bold', fg='#f00')
-            ResultLabel.place(x=400, y=250)
-
-
-        else:
-            UserGuessEntry.delete(0, END)
-            UserGuessValidationLabel = Label(UserBetFrame, text="*You can choose only odd or even, try again", fg="#f00")
-            UserGuessValidationLabel.grid(row=0, column=2)
-
-    except ValueError:
-        UserBetEntry.delete(0, END)
-        UserBetValidationLabel = Label(UserBetFrame, text="*Bet should be numeric", fg="#f00")
-        UserBetValidationLabel.grid(row=1, column=2)
-
-#High or low bet option
-def high_low(Username, Bet, UserGuess):
+#Show the outcome of a bet settled by the ledger writer, Error is the exception raised while settling it
+def bet_settled(Result, Error, Start):
     global UserBetValidationLabel
-    global UserGuessValidationLabel
     global ResultLabel
 
-    RandValue = randint(1, 36)
-    try:
-        Bet = float(Bet)
-        UserGuess = UserGuess.lower()
-
-        if UserGuess == ('low' if RandValue <= 18 else 'high'):
-            insert_transaction(Username, Bet*2, 'high_low')
-            UserGuessEntry.delete(0, END)
-            UserBetEntry.delete(0, END)
-            ResultLabel = Label(Game, text=f'Congratulation, the ball landed on {RandValue}', font='Arial 18 bold', fg='#f00')
-            ResultLabel.place(x=400, y=250)
-
-        elif UserGuess in ('low', 'high'):
-            insert_transaction(Username, Bet*-1, 'high_low')
-            UserGuessEntry.delete(0, END)
-            UserBetEntry.delete(0, END)
-            ResultLabel = Label(Game, text=f'Sorry, the ball landed on {RandValue}', font='Arial 18 bold', fg='#f00')
-            ResultLabel.place(x=400, y=250)
-
-        else:
-            UserGuessEntry.delete(0, END)
-            UserGuessValidationLabel = Label(UserBetFrame, text="*You can choose only high or low, try again", fg="#f00")
-            UserGuessValidationLabel.grid(row=0, column=2)
-
-    except ValueError:
-        UserBetEntry.delete(0, END)
-        UserBetValidationLabel = Label(UserBetFrame, text="*Bet should be numeric", fg="#f00")
+    #The bet could not be written, the balance held by the session is read again before the next bet
+    if Error is not None:
+        Session.invalidate()
+        destroy_label()
+        UserBetValidationLabel = Label(UserBetFrame, text=f"*The bet could not be settled: {Error}", fg="#f00")
         UserBetValidationLabel.grid(row=1, column=2)
+        return
+    #The bet is not accepted when the player try to stake more than his balance
+    if not Result.Accepted:
+        destroy_label()
+        UserBetValidationLabel = Label(UserBetFrame, text="*Your balance is insufficient, please deposit\n or decrease your bet", fg="#f00")
+        UserBetValidationLabel.grid(row=1, column=2)
+        return
 
-# Merge sort algorithm, the operator variable represents the type of sort i.e. Ascending or Descending
-def merge_sort(SortList, Operator):
-    OperatorFunction = { ">": operator.gt, "<": operator.lt }
-
-    if len(SortList) > 1:
-        # Divide orginal list
-        Middle = len(SortList) // 2
-        Left = SortList[:Middle]
-        Right = SortList[Middle:]
-
-        # Call each half recursively
-        merge_sort(Left, Operator)
-        merge_sort(Right, Operator)
-
-        # Two Counters for the two halves
-        x = 0
-        y = 0
-
-        # Counter for the orginal list
-        i = 0
-
-        while x < len(Left) and y < len(Right):
-            # if operator variable is '<' then it is ascending sort
-            # if operator variable is '>' then it is descending sort
-            if OperatorFunction[Operator](Left[x] [1], Right[y] [1]):
-              #Use the array from left half
-              SortList[i] = Left[x]
-              x += 1
-
-            else:
-                #Use the array from right half
-                SortList[i] = Right[y]
-                y += 1
+    with timed('widget_update'):
+        if 'ResultLabel' in globals():
+            ResultLabel.destroy()
+        if Result.Won:
+            ResultLabel = Label(Game, text=f'Congratulation, the ball landed on {Result.RandValue}', font='Arial 18 bold', fg='#f00')
+        else:
+            ResultLabel = Label(Game, text=f'Sorry, the ball landed on {Result.RandValue}', font='Arial 18 bold', fg='#f00')
+        ResultLabel.place(x=400, y=250)
+        #Update player balance in the game window, the session holds it already
+        BalanceLabel.config(text=f"Balance: {format_money(Session.Balance)}")
+    finished('bet', Start)
 
-            i += 1
+#Single Number bet option
+def single_num(Bet, UserGuess):
+    place_bet('single_num', Bet, UserGuess)
 
-        # For all the remaining arrays
-        while x < len(Left):
-            SortList[i] = Left[x]
-            x += 1
-            i += 1
+#Odd or Even bet option
+def odd_even(Bet, UserGuess):
+    place_bet('odd_even', Bet, UserGuess)
 
-        while y < len(Right):
-            SortList[i]=Right[y]
-            y += 1
-            i += 1
+#High or low bet option
+def high_low(Bet, UserGuess):
+    place_bet('high_low', Bet, UserGuess)
 
 """
 The following functions are for the GUI, there are three main pages:
@@ -280,6 +117,25 @@ Notice in each page we define variables scope and the window and its geometry, t
 and where it is located. In this software we used the three of tkinter built-in layout managers: pack, grid and place.
 """
 
+#Open source modules (Pillow and tkcalendar) are imported only when a page needing them opens,
+#so importing this file is fast and has no side effects: the database is opened by its first query
+#and the GUI starts from main() when the file is run
+def require_modules():
+    print('Please install the required modules using\npip install Pillow\npip install tkcalendar ')
+    quit()
+
+#Background picture of the pages, resized to the window and cached (see Roulette_Assets.py)
+#Pillow is only needed the first time a size is used
+def background_image(Window, Width, Height):
+    try:
+        return background(Window, Width, Height)
+    except ModuleNotFoundError:
+        require_modules()
+
+#The validation labels of the Registration page by field, and the row of the field in the page
+ValidationLabels = dict()
+REGISTRATION_ROWS = {'username': 0, 'password': 1, 'email': 2, 'forename': 3, 'surname': 4, 'birth': 5}
+
 #Check if any of the Validation labels exsit and remove them when the function is called
 def destroy_label():
     if 'LoginLabel' in globals():
@@ -288,20 +144,9 @@ def destroy_label():
         WrongUserLbael.destroy()
     if 'WrongPassLbael' in globals():
         WrongPassLbael.destroy()
-    if 'UserValidationLabel' in globals():
-        UserValidationLabel.destroy()
-    if 'PassValidationLabel' in globals():
-        PassValidationLabel.destroy()
-    if 'EmailValidationLabel' in globals():
-        EmailValidationLabel.destroy()
-    if 'ForenameValidationLabel' in globals():
-        ForenameValidationLabel.destroy()
-    if 'SurnameValidationLabel' in globals():
-        SurnameValidationLabel.destroy()
-    if 'BirthValidationLabel' in globals():
-        BirthValidationLabel.destroy()
-    if 'PassValidationLabel' in globals():
-        PassValidationLabel.destroy()
+    for ValidationLabel in ValidationLabels.values():
+        ValidationLabel.destroy()
+    ValidationLabels.clear()
     if 'UserBetValidationLabel' in globals():
         UserBetValidationLabel.destroy()
     if 'UserGuessValidationLabel' in globals():
@@ -330,7 +175,7 @@ def login_page():
     Root.title("Login page")
 
     #Background picture
-    RCasino = ImageTk.PhotoImage(Image.open("Casino.jpg"))
+    RCasino = background_image(Root, 600, 600)
     Imagebg = Label(Root, image=RCasino)
     Imagebg.place(x=0, y=0, relwidth=1, relheight=1)
 
@@ -368,6 +213,7 @@ def login_verify():
     global WrongUserLbael
     global WrongPassLbael
     global Counter
+    global Session
     destroy_label()
 
     #Check that the player has entered the password and username
@@ -378,16 +224,21 @@ def login_verify():
         PasswordEntry.delete(0, END)
 
     else:
+        #Query the player once and verify the password against the stored hash (see Roulette_Password.py),
+        #the record is kept in the session of the player after a successful login
+        Record, Valid = check_login(UsernameEntry.get(), PasswordEntry.get())
+
         #Check if Username exist in the database
-        if len(get_player(UsernameEntry.get())) == 0:
+        if Record is None:
             WrongUserLbael = Label(LoginFrame, text='**Username is incorrect', fg='#f00')
             WrongUserLbael.grid(row=0, column=2, padx=20)
             UsernameEntry.delete(0, END)
             PasswordEntry.delete(0, END)
 
         #Check that the password is correct
-        elif get_player(UsernameEntry.get())[0][1] == PasswordEntry.get():
+        elif Valid:
             PasswordEntry.delete(0, END)
+            Session = Player(UsernameEntry.get(), Record)
             #Declaration message appears to warn the user after a successful login
             Response = messagebox.askyesno('Declaration',
              "I understand that I can lose all of my funds when gambling as the odds are against me.\n I understand that I am not diagnosed with gambling addiction.")
@@ -399,7 +250,7 @@ def login_verify():
                 print('Then buy crypto rug pulls better than gambling, xD')
 
         #If password is incorrect
-        elif get_player(UsernameEntry.get())[0][1] != PasswordEntry.get():
+        else:
             WrongPassLbael = Label(LoginFrame, text='**Password is incorrect', fg='#f00')
             WrongPassLbael.grid(row=1, column=2, padx=20)
             PasswordEntry.delete(0, END)
@@ -431,6 +282,11 @@ def register_page():
 
     #Calendar for inserting birth date
     def birth():
+        try:
+            from tkcalendar import Calendar  #pip install tkcalendar
+        except ModuleNotFoundError:
+            require_modules()
+
         DateSelection = Toplevel(Register)
         DateSelection.title('Calendar')
         # Register.withdraw()
@@ -456,143 +312,22 @@ def register_page():
 
         DateSelection.mainloop()
 
-    #Validtion points
+    #Validtion points, every field is checked at once (see Roulette_Validation.py) and each invalid one gets its message
     def validation():
         destroy_label()
 
-        """
-        Check if username is not taken by another player previously,
-        username should be 4 characters long at least and contain only alphabetic letters and numbers
-        """
-        def username_validation():
-            global UserValidationLabel
-
-            if len(get_player(RUsernameEntry.get())) != 0:
-                UserValidationLabel = Label(RegisterFrame, text='*Username alread exist, please choose another one', fg="#f00")
-                UserValidationLabel.grid(row=0, column=2, padx=10)
-
-            elif len(RUsernameEntry.get()) < 4:
-                UserValidationLabel = Label(RegisterFrame, text='*Username should be 4 characters long at least', fg="#f00")
-                UserValidationLabel.grid(row=0, column=2, padx=10)
-
-            elif not RUsernameEntry.get().isalnum():
-                UserValidationLabel = Label(RegisterFrame, text='*Username should contain only alphabetic letters and numbers', fg="#f00")
-                UserValidationLabel.grid(row=0, column=2, padx=10)
-            else:
-                return True
-
-
-        """
-        Check if password is 6-10 characters long and contain at least:
-        one uppercase, one lowercase, one digit and one special character. Moreover, does not contain a whitespace.
-        """
-        def passowrd_validation():
-            global PassValidationLabel
-
-
-            if (len(RPasswordEntry.get()) < 6) or (len(RPasswordEntry.get()) > 10):
-                PassValidationLabel = Label(RegisterFrame, text='*Password should be 6-10 characters long', fg="#f00")
-                PassValidationLabel.grid(row=1, column=2)
-            elif not re.search("[A-Z]", RPasswordEntry.get()):
-                PassValidationLabel = Label(RegisterFrame, text='*Password should contain one uppercase at least', fg="#f00")
-                PassValidationLabel.grid(row=1, column=2)
-            elif not re.search("[a-z]", RPasswordEntry.get()):
-                PassValidationLabel = Label(RegisterFrame, text='*Password should contain one lowercase at least', fg="#f00")
-                PassValidationLabel.grid(row=1, column=2)
-            elif not re.search("[0-9]", RPasswordEntry.get()):
-                PassValidationLabel = Label(RegisterFrame, text='*Password should contain one digit at least', fg="#f00")
-                PassValidationLabel.grid(row=1, column=2)
-            elif not re.search("[#$%&(_)*-]", RPasswordEntry.get()):
-                PassValidationLabel = Label(RegisterFrame, text='*Password should contain at least one special characters from #$%&(_)*-', fg="#f00")
-                PassValidationLabel.grid(row=1, column=2)
-            elif re.search("\s", RPasswordEntry.get()):
-                PassValidationLabel = Label(RegisterFrame, text='*Password should not contain space', fg="#f00")
-                PassValidationLabel.grid(row=1, column=2)
-            else:
-                return True
-
-
-        #Check if email in a correct format: example@domain.com
-        def email_validation():
-            global EmailValidationLabel
-            pattern = re.compile('^(\w|\.|\_|\-)+[@](\w|\_|\-|\.)+[.]\w{2,3}$')
-
-            if REmailEntry.get() == 'example@domain.com' or len(REmailEntry.get()) == 0:
-                EmailValidationLabel = Label(RegisterFrame, text='*Please enter your email', fg="#f00")
-                EmailValidationLabel.grid(row=2, column=2, padx=10)
-                REmailEntry.delete(0, END)
-
-            elif  pattern.search(REmailEntry.get()) is None:
-                EmailValidationLabel = Label(RegisterFrame, text='*Please enter your email in a correct format: example@domain.com', fg="#f00")
-                EmailValidationLabel.grid(row=2, column=2, padx=10)
-                REmailEntry.delete(0, END)
-            else:
-                return True
-
-
-        """
-        Check if forename and surname contain only alphabetic letters (with exception for ‘.’ string)
-        and are not more than 10 characters long
-        """
-        def forename_validation():
-            global ForenameValidationLabel
-
-            if len(RForenameEntry.get()) == 0:
-                 ForenameValidationLabel = Label(RegisterFrame, text='*Please enter your forename ', fg="#f00")
-                 ForenameValidationLabel.grid(row=3, column=2, padx=10)
-
-            elif len(RForenameEntry.get()) >= 10:
-                 ForenameValidationLabel = Label(RegisterFrame, text='*Forename can not be more than 10 characters', fg="#f00")
-                 ForenameValidationLabel.grid(row=3, column=2, padx=10)
-
-            elif not RForenameEntry.get().replace('.', '').isalpha():
-                ForenameValidationLabel = Label(RegisterFrame, text='*Forename should only contain alphabetic letters ', fg="#f00")
-                ForenameValidationLabel.grid(row=3, column=2, padx=10)
-
-            else:
-                return True
-        def surname_validation():
-            global SurnameValidationLabel
-
-            if len(RSurnameEntry.get()) == 0:
-                 SurnameValidationLabel = Label(RegisterFrame, text='*Please enter your Surname ', fg="#f00")
-                 SurnameValidationLabel.grid(row=4, column=2, padx=10)
-
-            elif len(RSurnameEntry.get()) >= 10:
-                 SurnameValidationLabel = Label(RegisterFrame, text='*Surname can not be more than 10 characters ', fg="#f00")
-                 SurnameValidationLabel.grid(row=4, column=2, padx=10)
-
-            elif not RSurnameEntry.get().replace('.', '').isalpha():
-                SurnameValidationLabel = Label(RegisterFrame, text='*Surname should only contain alphabetic letters ', fg="#f00")
-                SurnameValidationLabel.grid(row=4, column=2, padx=10)
-            else:
-                return True
-
-        #Check if Player age is 18 or above
-        def birth_validation():
-            global BirthValidationLabel
-
-            CurrentDate = date.today()
-            try:
-                BirthDate = datetime.strptime(RBirthEntry.get(), '%Y-%m-%d').date()
-                UserAge = CurrentDate.year - BirthDate.year - ((CurrentDate.month, CurrentDate.day) < (BirthDate.month, BirthDate.day))
-                if UserAge < 18:
-                    BirthValidationLabel = Label(RegisterFrame, text='*User should be 18 or over', fg="#f00")
-                    BirthValidationLabel.grid(row=5, column=2)
-                else:
-                    return True
-
-            except ValueError:
-                BirthValidationLabel = Label(RegisterFrame, text='*Please use the Calendar to input your birth date', fg="#f00")
-                BirthValidationLabel.grid(row=5, column=2)
-
-
-        #Calling validation functions and check that all of them are met
-        if (username_validation() and passowrd_validation()
-            and email_validation() and forename_validation()
-            and surname_validation() and birth_validation()):
-            #Add the new player to the database
-            insert_player(RUsernameEntry.get(), RPasswordEntry.get(),
+        Errors = validate_registration(RUsernameEntry.get(), RPasswordEntry.get(), REmailEntry.get(),
+                                       RForenameEntry.get(), RSurnameEntry.get(), RBirthEntry.get(),
+                                       Exists=lambda Username: len(get_player(Username)) != 0)
+        for Field, Message in messages(Errors).items():
+            ValidationLabels[Field] = Label(RegisterFrame, text=Message, fg="#f00")
+            ValidationLabels[Field].grid(row=REGISTRATION_ROWS[Field], column=2, padx=10)
+        if 'email' in Errors:
+            REmailEntry.delete(0, END)
+
+        if not Errors:
+            #Add the new player to the database, with the hash of the password
+            insert_player(RUsernameEntry.get(), hash_password(RPasswordEntry.get()),
                           REmailEntry.get(), RForenameEntry.get(),
                           RSurnameEntry.get(), RBirthEntry.get())
             #Message congratualing the player of registration
@@ -606,7 +341,7 @@ def register_page():
     Register.title("Registration page")
 
     #Background Image
-    RCasino = ImageTk.PhotoImage(Image.open("Casino.jpg"))
+    RCasino = background_image(Register, 900, 600)
     Imagebg = Label(Register, image=RCasino)
     Imagebg.place(x=0, y=0, relwidth=1, relheight=1)
 
@@ -672,6 +407,8 @@ def game_page():
     global UserBetFrame
     global UserBetEntry
     global UserGuessEntry
+    global BalanceLabel
+    global Writer
 
     #Removing the login page and defining the Game page window
     Root.withdraw()
@@ -682,15 +419,17 @@ def game_page():
     def setting_page():
         Game.withdraw()
         Setting = Toplevel(Game)
-        Setting.geometry('600x500')
+        Setting.geometry('1000x500')
         Setting.title('Setting')
 
         #Navigating from setting page to game page
         def setting_to_game():
             Setting.destroy()
             Game.deiconify()
-        #Querying user data from the database
-        PlayerInfo = get_player(UsernameEntry.get())[0]
+        #User data from the session of the player and the totals kept in table PlayerStats
+        PlayerInfo = Session.record()
+        Stats = Session.stats()
+        LastActivity = datetime.fromtimestamp(Stats['LastActivity']).strftime('%Y-%m-%d %H:%M:%S') if Stats['LastActivity'] else '-'
 
         #Widgets and their location within the page
         RecordsFramee = LabelFrame(Setting, bd=0)
@@ -704,11 +443,23 @@ def game_page():
         RecordsFramee = LabelFrame(Setting, bd=0)
         RecordsFramee.place(x=180, y=30, width=400, height=330)
         UserLabel = Label(RecordsFramee, text=PlayerInfo[0], font='Arial 12 bold').pack(pady=20, anchor=W)
-        PassLabel = Label(RecordsFramee, text=''.join(['*' for i in PlayerInfo[1]]), font='Arial 12 bold').pack(pady=20, anchor=W)
+        PassLabel = Label(RecordsFramee, text='********', font='Arial 12 bold').pack(pady=20, anchor=W)
         EmailLabel = Label(RecordsFramee, text=PlayerInfo[2], font='Arial 12 bold').pack(pady=20, anchor=W)
         FullNameLabel = Label(RecordsFramee, text=' '.join(PlayerInfo[3:5]), font='Arial 12 bold').pack(pady=20, anchor=W)
         BirthLabel = Label(RecordsFramee, text=PlayerInfo[5], font='Arial 12 bold').pack(pady=20, anchor=W)
 
+        StatsFrame = LabelFrame(Setting, bd=0)
+        StatsFrame.place(x=600, y=30, width=180, height=330)
+        StatsFrameValues = LabelFrame(Setting, bd=0)
+        StatsFrameValues.place(x=780, y=30, width=200, height=330)
+        for Name, Value in (('Total Staked:', format_money(Stats['TotalStaked'])), ('Total Won:', format_money(Stats['TotalWon'])),
+                            ('Single Number Bets:', Stats['SingleNumBets']), ('Odd/Even Bets:', Stats['OddEvenBets']),
+                            ('High/Low Bets:', Stats['HighLowBets']),
+                            ('Deposits:', format_money(Stats['Deposits'])), ('Withdrawals:', format_money(Stats['Withdrawals'])),
+                            ('Last Activity:', LastActivity)):
+            Label(StatsFrame, text=Name, font='Arial 12').pack(pady=8, anchor=W)
+            Label(StatsFrameValues, text=Value, font='Arial 12 bold').pack(pady=8, anchor=W)
+
         InfoLabel= Label(Setting, text='If you wish to change any of the above data or delete \nyour account, then please contact the casino directly', font='Arial 16')
         InfoLabel.place(x=30, y=370)
 
@@ -725,31 +476,50 @@ def game_page():
 
         def credit_to_game():
             Credit.destroy()
-            BalanceLabel.config(text=f"Balance: ${get_balance(UsernameEntry.get())}")
+            BalanceLabel.config(text=f"Balance: {format_money(Session.Balance)}")
             Game.deiconify()
 
+        #Deposits and withdraws go through the ledger writer as well, so they are written in order with the bets
         def add_credit(Type):
             global AmountValidationLabel
             destroy_label()
 
             try:
-                if float(AmountEntry.get()) <= 0:
+                if to_cents(AmountEntry.get()) <= 0:
                     AmountValidationLabel = Label(Credit,  text="**Please enter a valid amount in usd", fg='#f00')
                     AmountValidationLabel.place(x=400, y=300)
                     AmountEntry.delete(0, END)
                 else:
-                    insert_transaction(UsernameEntry.get(), float(AmountEntry.get())*Type)
-                    DBalanceLabel.config(text=f"Balance: ${get_balance(UsernameEntry.get())}")
+                    Writer.submit(Session.insert_transaction, to_cents(AmountEntry.get())*Type, Callback=credit_added)
                     AmountEntry.delete(0, END)
 
-            #sqlite3.IntegrityError ia raised when the player try to withdraw more than his balance
-            except (sqlite3.IntegrityError, ValueError):
+            except ValueError:
                 AmountValidationLabel = Label(Credit,  text="**Please enter a valid amount in usd", fg='#f00')
                 AmountValidationLabel.place(x=400, y=300)
                 AmountEntry.delete(0, END)
+            except queue.Full:
+                AmountValidationLabel = Label(Credit,  text="**Too many bets are waiting, please wait", fg='#f00')
+                AmountValidationLabel.place(x=400, y=300)
+
+        #Called back by the ledger writer once the credit is written, the page may have been closed meanwhile
+        def credit_added(Result, Error):
+            global AmountValidationLabel
+            if not Credit.winfo_exists():
+                return
+            if Error is not None:
+                Session.invalidate()
+                AmountValidationLabel = Label(Credit,  text=f"**The transaction could not be written: {Error}", fg='#f00')
+                AmountValidationLabel.place(x=400, y=300)
+                return
+            #Result is False when the player try to withdraw more than his balance
+            if not Result:
+                AmountValidationLabel = Label(Credit,  text="**Please enter a valid amount in usd", fg='#f00')
+                AmountValidationLabel.place(x=400, y=300)
+            else:
+                DBalanceLabel.config(text=f"Balance: {format_money(Session.Balance)}")
 
 
-        DBalanceLabel = Label(Credit, text=f"Your Balance: ${get_balance(UsernameEntry.get())}", font="Arial 16")
+        DBalanceLabel = Label(Credit, text=f"Your Balance: {format_money(Session.Balance)}", font="Arial 16")
         DBalanceLabel.place(x=50, y=20)
         GuideLable = Label(Credit, text='Warning! please refer to the guide page \non how deposit and withdraw work\n otherwise you risk restricting your account',
         font="Arial 21", fg="#f00")
@@ -786,62 +556,135 @@ def game_page():
         tree_scroll = Scrollbar(TreeFrame)
         tree_scroll.pack(side=RIGHT, fill=Y)
 
+        #The GUI table shows a window of the history: records are fetched PageSize at a time when the scroll bar
+        #nears the end (or the start) and at most MaxRows are kept, the rest are removed from the other end
+        Username = Session.Username
+        PageSize = 100
+        MaxRows = 3*PageSize
+        Keys = dict()     #The key of every record in the GUI table, to continue from (see get_history_page)
+        FirstRow = 0      #The row number of the first record in the GUI table
+        AtStart = True    #Whether the first record of the history is in the GUI table
+        AtEnd = True      #Whether the last record of the history is in the GUI table
+        Loading = False
+        #How the history is sorted and filtered, they are passed to get_history_page so the database does the work
+        View = {'Order': 'TimeDate', 'Descending': False, 'Games': None}
+
         #This function deletes the data in the GUI table
         def delete_data():
-            for i in TableData.get_children():
-                TableData.delete(i)
-
-        #This function retrieve the data in the GUI table before calling delete_data
-        #The data is stored as a list of tuples
-        def get_table_data():
-            global Data
-            Data = list()
-            for line in TableData.get_children():
-                Data.append(tuple(TableData.item(line)['values']))
+            TableData.delete(*TableData.get_children())
+            Keys.clear()
+
+        #Insert a page of records to the end of the GUI table, or to the start when scrolling back up
+        def insert_page(Rows, Start=False):
+            nonlocal FirstRow
+            if Start:
+                FirstRow -= len(Rows)
+                Index = FirstRow
+            else:
+                Index = FirstRow + len(Keys)
+
+            for HistoryID, BetType, Credit, DateTime, Key in Rows:
+                Item = TableData.insert(parent='', index=Index - FirstRow, iid=HistoryID, text="", values=(Index, BetType, format_money(Credit), DateTime))
+                Keys[Item] = Key
+                Index += 1
+
+        #Remove records from the start (or the end) of the GUI table so at most MaxRows are kept
+        def trim_rows(Start):
+            nonlocal FirstRow
+            Extra = len(Keys) - MaxRows
+            if Extra > 0:
+                Items = TableData.get_children()
+                Items = Items[:Extra] if Start else Items[-Extra:]
+                TableData.delete(*Items)
+                for Item in Items:
+                    del Keys[Item]
+                if Start:
+                    FirstRow += Extra
+            return Extra > 0
+
+        #Fetch the page after the last record in the GUI table
+        def load_next():
+            nonlocal AtStart, AtEnd, Loading
+            Items = TableData.get_children()
+            #The table was emptied (e.g. another sort or filter) since the page was queued
+            if not Items:
+                Loading = False
+                return
+            Rows = get_history_page(Username, After=Keys[Items[-1]], Limit=PageSize, **View)
+            AtEnd = len(Rows) < PageSize
+            insert_page(Rows)
+            if trim_rows(Start=True):
+                AtStart = False
+            #Keep the record the player was looking at in view
+            TableData.see(Items[-1])
+            Loading = False
+
+        #Fetch the page before the first record in the GUI table
+        def load_previous():
+            nonlocal AtStart, AtEnd, Loading
+            Items = TableData.get_children()
+            #The table was emptied (e.g. another sort or filter) since the page was queued
+            if not Items:
+                Loading = False
+                return
+            Rows = get_history_page(Username, Before=Keys[Items[0]], Limit=PageSize, **View)
+            AtStart = len(Rows) < PageSize
+            insert_page(Rows, Start=True)
+            if trim_rows(Start=False):
+                AtEnd = False
+            TableData.see(Items[0])
+            Loading = False
+
+        #Called whenever the GUI table scrolls, load another page when the scroll bar nears either end
+        def table_scrolled(First, Last):
+            nonlocal Loading
+            tree_scroll.set(First, Last)
+            if Loading or not Keys:
+                return
+            if float(Last) > 0.9 and not AtEnd:
+                Loading = True
+                History.after_idle(load_next)
+            elif float(First) < 0.1 and not AtStart:
+                Loading = True
+                History.after_idle(load_previous)
+
+        #Show the first page of the history as sorted and filtered in View
+        def show_view():
+            nonlocal FirstRow, AtStart, AtEnd
             delete_data()
+            FirstRow = 0
+            Rows = get_history_page(Username, Limit=PageSize, **View)
+            AtStart = True
+            AtEnd = len(Rows) < PageSize
+            insert_page(Rows)
 
-        #filtering the data in the table according to user preference
+        #filtering the data in the table according to user preference, the current sort is kept
         def table_filter(Type):
-            get_table_data()
-            if Type == 'Games':
-                Holding = filter(lambda List: List[0] is not None, Data)
-            else:
-                Holding = filter(lambda List: List[0] is None, Data)
-
-            i = 0
-            while True:
-                try:
-                    Place = next(Holding)
-                except StopIteration:
-                    break
-                TableData.insert(parent='', index='end', iid=i, text="", values=(i, Place[0], Place[1], Place[2]))
-                i += 1
+            View['Games'] = Type == 'Games'
+            show_view()
 
         #Return to game page
         def history_to_game():
             History.destroy()
             Game.deiconify()
 
-        #Sort the data for the user according to his preference (Ascending or Descending)
-        def sort(Operator):
-            # global Data
-            get_table_data()
-            merge_sort(Data, Operator)
+        #Sort the data for the user according to his preference (Ascending or Descending) of credit, the current filter is kept
+        def sort(Operator, Order='Credit'):
+            View['Order'] = Order
+            View['Descending'] = Operator == '>'
+            show_view()
 
-            for i in range(len(Data)):
-                TableData.insert(parent='', index='end', iid=i, text="", values=(i, Data[i][0], Data[i][1], Data[i][2]))
+        #Clicking on the heading of the Credit or Date Time column sorts by that column, clicking again reverses the sort
+        def sort_column(Order):
+            sort('<' if View['Order'] != Order or View['Descending'] else '>', Order)
 
-        #Retrieve orginal data (without filtering or sorting) from the Hisotry table and insert data to a table in the GUI
+        #Retrieve orginal data (without filtering or sorting) from the Hisotry table, only the first page is inserted
         def orginal_table():
-            global Data
-            delete_data()
-
-            Data = get_history(UsernameEntry.get())
-            for i in range(len(Data)):
-            	TableData.insert(parent='', index='end', iid=i, text="", values=(i, Data[i][0], Data[i][1], Data[i][2]))
+            View.update(Order='TimeDate', Descending=False, Games=None)
+            show_view()
 
         #Defining the GUI table
-        TableData = ttk.Treeview(TreeFrame, yscrollcommand=tree_scroll.set, selectmode="extended")
+        TableData = ttk.Treeview(TreeFrame, yscrollcommand=table_scrolled, selectmode="extended")
         tree_scroll.config(command=TableData.yview)
 
         #Defining the GUI table columns/rows and their size
@@ -854,8 +697,8 @@ def game_page():
         TableData.heading("#0", text="", anchor=W)
         TableData.heading("Row", text="Row", anchor=CENTER)
         TableData.heading("BetType", text="Game", anchor=CENTER)
-        TableData.heading("Credit", text="Credit", anchor=CENTER)
-        TableData.heading("TimeDate", text="Date Time", anchor=CENTER)
+        TableData.heading("Credit", text="Credit", anchor=CENTER, command=lambda: sort_column('Credit'))
+        TableData.heading("TimeDate", text="Date Time", anchor=CENTER, command=lambda: sort_column('TimeDate'))
 
         #Clear sorting and filtering
         ClearButton = Button(History, text='Clear', command=orginal_table)
@@ -877,8 +720,7 @@ def game_page():
         ShowTransactButton.place(x=250, y=60)
 
 
-        #Get the records for the specfied username in table History
-        Data = get_history(UsernameEntry.get())
+        #Get the first page of records for the specfied username in table History
         orginal_table()
 
         TableData.pack(side=TOP, fill=BOTH, expand=1)
@@ -930,17 +772,8 @@ def game_page():
             UserBetValidationLabel.grid(row=1, column=2)
 
         else:
-            try:
-                #Depending on the type of bet, the code will run the suitable function:single_num, odd_even or high_low
-                function(UsernameEntry.get(), UserBetEntry.get(), UserGuessEntry.get())
-                #Update player balance in the game window
-                BalanceLabel.config(text=f"Balance: ${get_balance(UsernameEntry.get())}")
-
-            #sqlite3.IntegrityError ia raised when the player try to stake more than his balance
-            except sqlite3.IntegrityError:
-                UserBetValidationLabel = Label(UserBetFrame, text="*Your balance is insufficient, please deposit\n or decrease your bet", fg="#f00")
-                UserBetValidationLabel.grid(row=1, column=2)
-                UserBetEntry.delete(0, END)
+            #Depending on the type of bet, the code will run the suitable function:single_num, odd_even or high_low
+            function(UserBetEntry.get(), UserGuessEntry.get())
 
 
     #The tilte label and its location
@@ -967,8 +800,8 @@ def game_page():
     #Defining teh frame where the text welcome username is diplayed together with his balance
     TopFrame = LabelFrame(Game, pady=5, bd=0)
     TopFrame.place(x=50, y=20, width=200, height=100)
-    WelcomeLabel = Label(TopFrame, text=f"Welcome {UsernameEntry.get()}", font="Arial 14")
-    BalanceLabel = Label(TopFrame, text=f"Balance: ${get_balance(UsernameEntry.get())}", font="Arial 14")
+    WelcomeLabel = Label(TopFrame, text=f"Welcome {Session.Username}", font="Arial 14")
+    BalanceLabel = Label(TopFrame, text=f"Balance: {format_money(Session.Balance)}", font="Arial 14")
     WelcomeLabel.pack(pady=10)
     BalanceLabel.pack(pady=10)
 
@@ -995,11 +828,19 @@ def game_page():
     OddEvenButton.pack(pady=10)
     HighLowButton.pack(pady=10)
 
+    #The bets are settled by the ledger writer, its results are collected every 20ms
+    Writer = LedgerWriter()
+    Writer.schedule(Game)
+
     Game.mainloop()
 
-login_page()
+#Start the software from the login page
+def main():
+    configure_from_environment()
+    login_page()
 
-Root.mainloop()
+if __name__ == '__main__':
+    main()
 ################################################################################
 ################################################################################
 ################################################################################
\ No newline at end of file
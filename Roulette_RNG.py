@@ -0,0 +1,127 @@
+import hashlib
+import random
+import secrets
+
+from collections import namedtuple
+
+"""
+Random number sources of the wheel. Every source draws spins (numbers from 1 to 36) and describes every spin by
+the seed and the position it was drawn from, so the spin can be drawn again (replayed) later, e.g. to settle a dispute.
+The description is written to table SpinLog together with the bet (see Roulette_Database.py).
+        SystemSource  cryptographic, the default of the software: every spin gets a fresh 128 bit seed from the operating system
+                      and the number is derived from it with SHA-256, so nobody can predict the next spin
+        PCG64Source   fast, for simulations, benchmarks and bulk settlement: NumPy PCG64 draws blocks of BLOCK_SIZE spins at a time,
+                      block k of a seed always holds the same spins so spin number k*BLOCK_SIZE + i can be drawn again
+        PythonSource  the same blocks as PCG64Source drawn with the random library, when NumPy is not installed
+"""
+
+WHEEL = range(1, 37)
+BLOCK_SIZE = 4096
+
+# One drawn spin, Source is the name of the source, replay(Source, Seed, Position) gives RandValue again
+Spin = namedtuple('Spin', ['RandValue', 'Source', 'Seed', 'Position'])
+
+# Import NumPy once, it takes longer to import than the rest of the software
+np = None
+def load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy as np  #pip install numpy
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError('This needs NumPy, please install it using\npip install numpy') from None
+    return np
+
+class SystemSource:
+    Name = 'system'
+
+    # The number of a seed: the first byte of SHA-256(seed, counter) below 252 (7 times 36, so every number is equally likely)
+    @staticmethod
+    def draw(Seed, Position=0):
+        Counter = 0
+        while True:
+            for Byte in hashlib.sha256(f'{Seed}:{Counter}'.encode()).digest():
+                if Byte < 252:
+                    return Byte % 36 + 1
+            Counter += 1
+
+    def spin(self):
+        Seed = secrets.token_hex(16)
+        return Spin(self.draw(Seed), self.Name, Seed, 0)
+
+    def spins(self, Count):
+        return [self.spin() for i in range(Count)]
+
+# Blocks of spins drawn from one seed, the subclasses draw a whole block at once
+class BlockSource:
+    def __init__(self, Seed=None):
+        self.Seed = str(Seed if Seed is not None else secrets.randbits(128))
+        self.Position = 0
+        self.Buffer = []
+
+    def spin(self):
+        Offset = self.Position % BLOCK_SIZE
+        if Offset == 0 or len(self.Buffer) == 0:
+            self.Buffer = self.block(self.Seed, self.Position // BLOCK_SIZE)
+        Result = Spin(int(self.Buffer[Offset]), self.Name, self.Seed, self.Position)
+        self.Position += 1
+        return Result
+
+    # The next Count spins
+    def spins(self, Count):
+        return [self.spin() for i in range(Count)]
+
+    @classmethod
+    def draw(cls, Seed, Position):
+        return int(cls.block(Seed, Position // BLOCK_SIZE)[Position % BLOCK_SIZE])
+
+class PCG64Source(BlockSource):
+    Name = 'pcg64'
+
+    @staticmethod
+    def block(Seed, Block):
+        np = load_numpy()
+        Generator = np.random.Generator(np.random.PCG64(np.random.SeedSequence(int(Seed), spawn_key=(Block,))))
+        return Generator.integers(1, 37, size=BLOCK_SIZE, dtype=np.int16)
+
+    # The next Count numbers as an array and the position of the first one, drawn block by block without making a Spin for each
+    def draw_array(self, Count):
+        np = load_numpy()
+        First = self.Position
+        Parts = []
+        while Count > 0:
+            Offset = self.Position % BLOCK_SIZE
+            if Offset == 0 or len(self.Buffer) == 0:
+                self.Buffer = self.block(self.Seed, self.Position // BLOCK_SIZE)
+            Size = min(Count, BLOCK_SIZE - Offset)
+            Parts.append(self.Buffer[Offset:Offset + Size])
+            self.Position += Size
+            Count -= Size
+        return (np.concatenate(Parts) if Parts else np.empty(0, dtype=np.int16)), First
+
+class PythonSource(BlockSource):
+    Name = 'python'
+
+    @staticmethod
+    def block(Seed, Block):
+        return random.Random(f'{Seed}:{Block}').choices(WHEEL, k=BLOCK_SIZE)
+
+SOURCES = {Source.Name: Source for Source in (SystemSource, PCG64Source, PythonSource)}
+
+# Draw a logged spin again
+def replay(Source, Seed, Position):
+    return SOURCES[Source].draw(Seed, Position)
+
+# Whether a logged spin, e.g. check(*get_spin(SpinID)), is the spin its source draws again
+def check(Source, Seed, Position, RandValue):
+    return replay(Source, Seed, Position) == RandValue
+
+# The source used when a bet does not name one
+Default = SystemSource()
+
+def set_default(Source):
+    global Default
+    Default = Source
+
+def get_default():
+    return Default
@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import json
+import sqlite3
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from Roulette_Database import LedgerBatch, open_database
+from Roulette_Engine import BetError, parse_bet
+from Roulette_Metrics import configure_from_environment
+from Roulette_Money import from_cents
+from Roulette_Password import check_login
+from Roulette_RNG import get_default
+from Roulette_Session import Player
+
+"""
+Table server: many players connect to one process and bet on the same spins of a shared table.
+Clients talk to the server over TCP (or a Unix socket) with one JSON object per line:
+        {"command": "login", "username": "...", "password": "..."}    -> {"ok": true, "balance": ...}
+        {"command": "bet", "bet_type": "odd_even", "guess": "odd", "bet": 5}
+                                                                        -> {"ok": true, "round": 12}
+        {"command": "balance"}                                         -> {"ok": true, "balance": ...}
+        {"command": "quit"}
+A failed command is answered with {"ok": false, "error": "..."} (for an invalid bet "errors" has one message per field
+and "codes" one error code per field, see Roulette_Validation.py).
+Amounts are in dollars with at most 2 decimals, the server holds them in cents (see Roulette_Money.py).
+
+The table runs in rounds: bets are collected for RoundSeconds, then the wheel spins once and every bet of the round
+is settled against that spin. Each player then receives
+        {"event": "result", "round": 12, "rand_value": 7, "won": true, "credit": 10.0, "balance": 110.0}
+or {"event": "result", "round": 12, "ok": false, "error": "..."} when the balance was insufficient.
+
+Only the writer task writes to Roulette.db: it takes the closed rounds from a queue and settles each round in a single transaction
+on its own thread, so the event loop keeps serving the clients while the round is written.
+Logins and balance reads run on other threads, each with its own connection (see Roulette_Database.ConnectionPool).
+The sessions are shared by those threads, Table.Lock guards table Players (one session per username) and every session:
+a balance is read between two rounds, never while a round changes it.
+"""
+
+# One bet waiting for the end of the round, Session is the player who placed it (the client may log in as another one meanwhile)
+# and Client the connection the result is sent to
+class PendingBet:
+    def __init__(self, Client, Session, BetType, Bet, Guess):
+        self.Client = Client
+        self.Session = Session
+        self.BetType = BetType
+        self.Bet = Bet
+        self.Guess = Guess
+
+class Table:
+    def __init__(self, RoundSeconds=5):
+        self.RoundSeconds = RoundSeconds
+        self.Round = 1
+        self.Bets = []
+        self.Players = dict()        #One session per username, shared by every connection of the same player
+        self.Lock = threading.Lock()
+        self.Rounds = asyncio.Queue()
+        self.Writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='Writer')
+
+    # Close the current round every RoundSeconds and hand it to the writer task
+    async def run_rounds(self):
+        while True:
+            await asyncio.sleep(self.RoundSeconds)
+            if self.Bets:
+                await self.Rounds.put((self.Round, self.Bets))
+                self.Bets = []
+            self.Round += 1
+
+    # The only task writing to the database: settle the closed rounds one after the other
+    async def run_writer(self):
+        Loop = asyncio.get_running_loop()
+        while True:
+            Round, Bets = await self.Rounds.get()
+            Spin = get_default().spin()
+            Results = await Loop.run_in_executor(self.Writer, self.settle_round, Bets, Spin)
+            for Pending, Result in zip(Bets, Results):
+                Result.update({'event': 'result', 'round': Round})
+                await Pending.Client.send(Result)
+
+    # Settle every bet of a round against the same spin in one transaction, runs on the writer thread
+    # The spin is logged once in table SpinLog and every bet of the round refers to it, the sessions are locked meanwhile
+    def settle_round(self, Bets, Spin):
+        with self.Lock:
+            Results = []
+            RandValue = Spin.RandValue
+            try:
+                with LedgerBatch(BatchSize=len(Bets) + 1) as Ledger:
+                    SpinID = Ledger.log_spin(Spin)
+                    for Pending in Bets:
+                        Session = Pending.Session
+                        Result = Session.settle(Pending.BetType, Pending.Bet, Pending.Guess, RandValue=RandValue,
+                                                Ledger=Ledger, SpinID=SpinID)
+                        if Result.Accepted:
+                            Results.append({'ok': True, 'rand_value': RandValue, 'won': Result.Won,
+                                            'credit': from_cents(Result.Credit), 'balance': from_cents(Session.Balance)})
+                        else:
+                            Results.append({'ok': False, 'rand_value': RandValue, 'error': 'Your balance is insufficient'})
+            except sqlite3.Error as Error:
+                #Nothing of the round was written, the balances held by the sessions can not be trusted any more
+                for Pending in Bets:
+                    Pending.Session.invalidate()
+                return [{'ok': False, 'error': f'The round could not be settled: {Error}'} for Pending in Bets]
+            return Results
+
+    # Verify the password of the player and return the shared session, None when the login is incorrect
+    def login(self, Username, Password):
+        Record, Valid = check_login(Username, Password)
+        if not Valid:
+            return None
+        with self.Lock:
+            if Username not in self.Players:
+                self.Players[Username] = Player(Username, Record)
+            return self.Players[Username]
+
+    # The balance held by a session, runs on any thread
+    def balance(self, Session):
+        with self.Lock:
+            return Session.Balance
+
+# The connection of one player to the table
+class Client:
+    def __init__(self, Table, Reader, Writer):
+        self.Table = Table
+        self.Reader = Reader
+        self.Writer = Writer
+        self.Session = None
+
+    async def send(self, Message):
+        try:
+            self.Writer.write(json.dumps(Message).encode() + b'\n')
+            await self.Writer.drain()
+        except ConnectionError:
+            pass
+
+    async def serve(self):
+        try:
+            while True:
+                Line = await self.Reader.readline()
+                if not Line:
+                    break
+                try:
+                    Request = json.loads(Line)
+                    Command = Request.get('command')
+                except (ValueError, AttributeError):
+                    await self.send({'ok': False, 'error': 'Every request should be a JSON object on one line'})
+                    continue
+                if Command == 'quit':
+                    break
+                await self.send(await self.handle(Command, Request))
+        finally:
+            self.Writer.close()
+
+    async def handle(self, Command, Request):
+        if Command == 'login':
+            Session = await asyncio.to_thread(self.Table.login, str(Request.get('username')), str(Request.get('password')))
+            if Session is None:
+                return {'ok': False, 'error': 'Username or password is incorrect'}
+            self.Session = Session
+            return {'ok': True, 'balance': from_cents(await asyncio.to_thread(self.Table.balance, Session))}
+
+        if self.Session is None:
+            return {'ok': False, 'error': 'Please login first'}
+
+        if Command == 'balance':
+            return {'ok': True, 'balance': from_cents(await asyncio.to_thread(self.Table.balance, self.Session))}
+
+        if Command == 'bet':
+            BetType = Request.get('bet_type')
+            #Only a text can name a bet option, anything else (a list, an object) is unknown rather than an error of the server
+            if not isinstance(BetType, str):
+                return {'ok': False, 'error': f'Unknown bet type {BetType}'}
+            try:
+                Bet, Guess = parse_bet(BetType, Request.get('bet'), Request.get('guess'))
+            except KeyError:
+                return {'ok': False, 'error': f'Unknown bet type {BetType}'}
+            except BetError as Error:
+                return {'ok': False, 'error': str(Error), 'errors': Error.Errors, 'codes': Error.Codes}
+            #The bet is kept in dollars as sent, the session parses it again when the round is settled
+            self.Table.Bets.append(PendingBet(self, self.Session, BetType, Request.get('bet'), Guess))
+            return {'ok': True, 'round': self.Table.Round}
+
+        return {'ok': False, 'error': f'Unknown command {Command}'}
+
+async def serve(Host='127.0.0.1', Port=8765, Unix=None, RoundSeconds=5):
+    TableServer = Table(RoundSeconds)
+
+    async def connected(Reader, Writer):
+        await Client(TableServer, Reader, Writer).serve()
+
+    if Unix:
+        Server = await asyncio.start_unix_server(connected, path=Unix)
+    else:
+        Server = await asyncio.start_server(connected, Host, Port)
+
+    async with Server:
+        await asyncio.gather(Server.serve_forever(), TableServer.run_rounds(), TableServer.run_writer())
+
+def main():
+    Parser = argparse.ArgumentParser(description='Roulette table server, many players bet on the same spins')
+    Parser.add_argument('--host', default='127.0.0.1')
+    Parser.add_argument('--port', type=int, default=8765)
+    Parser.add_argument('--unix', help='listen on this Unix socket path instead of TCP')
+    Parser.add_argument('--round', type=float, default=5, help='seconds between two spins')
+    Parser.add_argument('--database', default='Roulette.db')
+    Arguments = Parser.parse_args()
+
+    open_database(Arguments.database)
+    configure_from_environment()
+    asyncio.run(serve(Arguments.host, Arguments.port, Arguments.unix, Arguments.round))
+
+if __name__ == '__main__':
+    main()
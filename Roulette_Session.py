@@ -0,0 +1,98 @@
+import sqlite3
+
+from Roulette_Database import get_player, get_player_stats, insert_transaction
+from Roulette_Engine import settle
+from Roulette_Metrics import timed
+
+"""
+The session of a logged in player. The record of the player in table Players is read once and kept in memory,
+every bet and credit change made through the session updates the balance it holds from the settled credit,
+so the pages of the game can show the balance without querying the database again. Balance and credits are in cents.
+If a write fails in an unexpected way the record is dropped (invalidated) and read again the next time it is needed.
+"""
+
+# The fields of table Players in the order of get_player
+PLAYER_FIELDS = ('Username', 'Password', 'Email', 'Forename', 'Surname', 'Birth', 'Balance')
+
+class Player:
+    # Record can be the row already returned by get_player, otherwise it is read the first time it is needed
+    def __init__(self, Username, Record=None):
+        self.Username = Username
+        self.Record = list(Record) if Record is not None else None
+
+    # Return the record of the player, reading it from the database if it is not cached
+    def record(self):
+        if self.Record is None:
+            with timed('balance_read'):
+                Rows = get_player(self.Username)
+            if len(Rows) == 0:
+                raise KeyError(f'Player {self.Username} does not exist')
+            self.Record = list(Rows[0])
+        return self.Record
+
+    # Drop the cached record, e.g. after the balance was changed outside of the session
+    def invalidate(self):
+        self.Record = None
+
+    @property
+    def Password(self):
+        return self.record()[1]
+
+    @property
+    def Email(self):
+        return self.record()[2]
+
+    @property
+    def FullName(self):
+        return ' '.join(self.record()[3:5])
+
+    @property
+    def Birth(self):
+        return self.record()[5]
+
+    @property
+    def Balance(self):
+        return self.record()[6]
+
+    # The totals of the player (see Roulette_Database.get_player_stats), read from table PlayerStats every time as they are cheap
+    def stats(self):
+        return get_player_stats(self.Username)
+
+    # Add a credit already written to the database to the cached balance
+    def apply(self, Credit):
+        if self.Record is not None:
+            self.Record[6] += Credit
+
+    # Run a write and keep the cached record in line with it: a rejected write (IntegrityError) changed nothing,
+    # any other error leaves the balance unknown so the record is invalidated
+    def write(self, Function, *Arguments, **Options):
+        try:
+            return Function(*Arguments, **Options)
+        except sqlite3.IntegrityError:
+            raise
+        except Exception:
+            self.invalidate()
+            raise
+
+    # Settle a bet for the player (see Roulette_Engine.settle) and return the BetResult,
+    # a bet the cached balance does not cover is rejected (Accepted false) without going to the database.
+    # A bet the cached balance covers but the ledger rejects means the balance in the database is lower, the record is dropped
+    def settle(self, BetType, Bet, UserGuess, **Options):
+        Balance = self.Balance
+        Result = self.write(settle, self.Username, BetType, Bet, UserGuess, Balance=Balance, **Options)
+        if not Result.Accepted and Result.Bet <= Balance:
+            self.invalidate()
+        self.apply(Result.Credit)
+        return Result
+
+    # Deposit (positive credit) or withdraw (negative credit) in cents, return False when the balance does not cover the withdraw,
+    # the record is dropped when the cached balance covered it but the ledger did not (see settle)
+    def insert_transaction(self, Credit, BetType=None):
+        if Credit < 0 and -Credit > self.Balance:
+            return False
+        Written = self.write(insert_transaction, self.Username, Credit, BetType)
+        if Written:
+            self.apply(Credit)
+        else:
+            self.invalidate()
+        return Written
@@ -0,0 +1,122 @@
+import argparse
+import json
+import math
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+from Roulette_Engine import BET_CODES, GUESS_CODES, load_numpy, settle_batch
+from Roulette_Money import to_cents
+
+"""
+Monte Carlo simulation of the bet options, to check the payout table (PAYOUTS in Roulette_Engine.py) before changing it.
+The spins are settled with the same vectorized settlement the software uses (settle_batch), a chunk of spins at a time,
+and the chunks are spread over a pool of processes, each with its own independent stream of random numbers
+(spawned from one seed, so a run can be repeated). Only sums are sent back, so billions of spins need little memory.
+
+For every bet option, staking 1 on every spin, it reports:
+        the expected value of a spin (positive means the player wins on average) and its 95% confidence interval
+        the variance and standard deviation of a spin
+        the probability of ruin: a player starting with Bankroll and staking Stake on every spin for SessionSpins spins
+        ends up unable to cover the next stake, with its 95% confidence interval
+
+    python Roulette_Simulation.py --spins 1000000000 --workers 8
+"""
+
+# The guess simulated for every bet option, by symmetry of the wheel the results do not depend on it
+SIMULATED_GUESSES = {'single_num': 17, 'odd_even': GUESS_CODES['odd'], 'high_low': GUESS_CODES['high']}
+
+# z value of a 95% confidence interval
+Z95 = 1.959963984540054
+
+# Settle Spins bets of one unit (a cent, settle_batch works in cents) on the bet option and return the sums needed for the mean and the variance
+def simulate_spins(BetType, Spins, Seed):
+    np = load_numpy()
+    Generator = np.random.Generator(np.random.PCG64(Seed))
+    Result = settle_batch(None, np.full(Spins, BET_CODES[BetType], dtype=np.int8),
+                          np.full(Spins, SIMULATED_GUESSES[BetType], dtype=np.int16), np.ones(Spins, dtype=np.int64), Generator=Generator)
+    return Spins, float(Result.Credits.sum()), float(np.square(Result.Credits).sum()), int(Result.Won.sum())
+
+# Play Sessions sessions of SessionSpins spins and return how many were ruined, Bankroll and Stake are in dollars
+def simulate_sessions(BetType, Sessions, SessionSpins, Bankroll, Stake, Seed):
+    np = load_numpy()
+    Bankroll, Stake = to_cents(Bankroll), to_cents(Stake)
+    Generator = np.random.Generator(np.random.PCG64(Seed))
+    Result = settle_batch(None, np.full(Sessions*SessionSpins, BET_CODES[BetType], dtype=np.int8),
+                          np.full(Sessions*SessionSpins, SIMULATED_GUESSES[BetType], dtype=np.int16),
+                          np.full(Sessions*SessionSpins, Stake, dtype=np.int64), Generator=Generator)
+    #Balance before every spin of every session, a session is ruined when it can not cover the stake of one of its spins
+    Balances = Bankroll + np.cumsum(Result.Credits.reshape(Sessions, SessionSpins), axis=1) - Result.Credits.reshape(Sessions, SessionSpins)
+    return Sessions, int((Balances < Stake).any(axis=1).sum())
+
+# Split Total into chunks of at most Chunk
+def chunks(Total, Chunk):
+    return [min(Chunk, Total - Start) for Start in range(0, Total, Chunk)]
+
+# Run the whole simulation of one bet option on the pool and summarise it
+def simulate(Pool, BetType, Spins, Chunk, Sessions, SessionSpins, Bankroll, Stake, Seed):
+    np = load_numpy()
+    SpinChunks = chunks(Spins, Chunk)
+    SessionChunks = chunks(Sessions, max(1, Chunk // SessionSpins))
+    Seeds = np.random.SeedSequence([Seed, BET_CODES[BetType]]).spawn(len(SpinChunks) + len(SessionChunks))
+
+    SpinJobs = [Pool.submit(simulate_spins, BetType, Size, Seeds[i]) for i, Size in enumerate(SpinChunks)]
+    SessionJobs = [Pool.submit(simulate_sessions, BetType, Size, SessionSpins, Bankroll, Stake, Seeds[len(SpinChunks) + i])
+                   for i, Size in enumerate(SessionChunks)]
+
+    Count = Total = Squares = Wins = 0
+    for Job in SpinJobs:
+        Size, Sum, SumSquares, Won = Job.result()
+        Count += Size
+        Total += Sum
+        Squares += SumSquares
+        Wins += Won
+    Played = Ruined = 0
+    for Job in SessionJobs:
+        Size, Lost = Job.result()
+        Played += Size
+        Ruined += Lost
+
+    Mean = Total / Count
+    Variance = (Squares - Count*Mean*Mean) / (Count - 1) if Count > 1 else 0.0
+    Error = Z95*math.sqrt(Variance / Count)
+    Ruin = Ruined / Played if Played else 0.0
+    RuinError = Z95*math.sqrt(Ruin*(1 - Ruin) / Played) if Played else 0.0
+    return {'bet_type': BetType, 'spins': Count, 'win_rate': Wins / Count,
+            'expected_value': Mean, 'expected_value_ci': [Mean - Error, Mean + Error], 'house_edge': -Mean,
+            'variance': Variance, 'standard_deviation': math.sqrt(Variance),
+            'sessions': Played, 'ruin_probability': Ruin, 'ruin_probability_ci': [max(0.0, Ruin - RuinError), min(1.0, Ruin + RuinError)]}
+
+def main():
+    Parser = argparse.ArgumentParser(description='Monte Carlo simulation of the bet options of the Roulette')
+    Parser.add_argument('--spins', type=int, default=100000000, help='spins simulated for every bet option')
+    Parser.add_argument('--bet-types', nargs='+', default=list(BET_CODES), choices=list(BET_CODES))
+    Parser.add_argument('--chunk', type=int, default=2000000, help='spins settled at once by a worker')
+    Parser.add_argument('--workers', type=int, default=os.cpu_count())
+    Parser.add_argument('--seed', type=int, default=0)
+    Parser.add_argument('--sessions', type=int, default=100000, help='sessions played to estimate the probability of ruin')
+    Parser.add_argument('--session-spins', type=int, default=100)
+    Parser.add_argument('--bankroll', type=float, default=100)
+    Parser.add_argument('--stake', type=float, default=10)
+    Parser.add_argument('--json', help='also write the results to this file')
+    Arguments = Parser.parse_args()
+
+    Results = []
+    with ProcessPoolExecutor(max_workers=Arguments.workers) as Pool:
+        for BetType in Arguments.bet_types:
+            Result = simulate(Pool, BetType, Arguments.spins, Arguments.chunk, Arguments.sessions, Arguments.session_spins,
+                              Arguments.bankroll, Arguments.stake, Arguments.seed)
+            Results.append(Result)
+            print(f"{BetType}: {Result['spins']} spins, win rate {Result['win_rate']:.6f}, "
+                  f"EV per unit staked {Result['expected_value']:+.6f} "
+                  f"(95% CI {Result['expected_value_ci'][0]:+.6f} to {Result['expected_value_ci'][1]:+.6f}), "
+                  f"variance {Result['variance']:.4f}, "
+                  f"ruin probability {Result['ruin_probability']:.4f} "
+                  f"(95% CI {Result['ruin_probability_ci'][0]:.4f} to {Result['ruin_probability_ci'][1]:.4f})")
+
+    if Arguments.json:
+        with open(Arguments.json, 'w') as File:
+            json.dump({'arguments': vars(Arguments), 'results': Results}, File, indent=2)
+
+if __name__ == '__main__':
+    main()
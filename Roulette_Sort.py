@@ -0,0 +1,43 @@
+from operator import itemgetter
+
+"""
+Sorting of history records, it replaces the recursive merge sort the history page used before the sorting moved to SQL.
+Records are sorted in place with list.sort (Timsort), which is stable, sorts by a key computed once per record
+and does not copy halves of the list at every level like the merge sort did.
+
+Any column of the records returned by get_history can be used, or a combination of them:
+        sort_history(Rows, 'Credit')                                    ascending credit
+        sort_history(Rows, 'Credit', Descending=True)                   descending credit
+        sort_history(Rows, ['BetType', ('Credit', True), 'TimeDate'])   game, then descending credit, then time
+Records with a missing value (e.g. BetType of deposits and withdraws) come first in ascending order.
+"""
+
+# Position of every column in the records returned by get_history
+HISTORY_COLUMNS = {'BetType': 0, 'Credit': 1, 'TimeDate': 2}
+
+# The key function of one column, a nullable column is wrapped so None can be compared with the other values
+def column_key(Rows, Column, Columns=HISTORY_COLUMNS):
+    Index = Columns[Column]
+    if any(Row[Index] is None for Row in Rows):
+        return lambda Row: (Row[Index] is not None, Row[Index])
+    return itemgetter(Index)
+
+# Sort the records in place by one or more columns, every column is a name or a (name, descending) pair
+def sort_history(Rows, Keys, Descending=False, Columns=HISTORY_COLUMNS):
+    if isinstance(Keys, (str, tuple)):
+        Keys = [Keys]
+    Keys = [(Key, Descending) if isinstance(Key, str) else Key for Key in Keys]
+
+    #The same direction for every column: a single sort with one key covering all of them
+    if all(Reverse == Keys[0][1] for Column, Reverse in Keys):
+        if len(Keys) == 1:
+            Rows.sort(key=column_key(Rows, Keys[0][0], Columns), reverse=Keys[0][1])
+        else:
+            Getters = [column_key(Rows, Column, Columns) for Column, Reverse in Keys]
+            Rows.sort(key=lambda Row: tuple(Getter(Row) for Getter in Getters), reverse=Keys[0][1])
+
+    #Mixed directions: one stable sort per column, from the least significant to the most significant
+    else:
+        for Column, Reverse in reversed(Keys):
+            Rows.sort(key=column_key(Rows, Column, Columns), reverse=Reverse)
+    return Rows
@@ -0,0 +1,167 @@
+import re
+
+from datetime import date
+
+from Roulette_Money import AmountError, to_cents
+
+"""
+Validators of what the players type, shared by the pages of the GUI, the table server and the bulk import.
+They do not touch tkinter nor the database so they can be used headlessly, every pattern is compiled once when imported:
+        1-Every field has a table of rules (RULES), each rule is an error code and a check, the first check failing gives the code
+        2-A validator checks every field in one pass and returns the errors as {field: code}, an empty dict when all are valid
+        3-MESSAGES gives the text shown by the pages for every (field, code), scripts and API clients can use the codes instead
+Whether a username is taken needs the database, the caller passes Exists (a function of the username) to check it,
+it is only called when the rest of the username is valid.
+
+    validate_registration('Hassan', 'Secret#1', 'hassan@example.com', 'Hassan', 'Ali', '2000-01-01')  #{}
+    validate_bet('single_num', '5', '40')                                                             #(500, None, {'guess': 'not_1_to_36'})
+"""
+
+# Limits of the registration fields, the messages below quote them
+USERNAME_MIN_LENGTH = 4
+PASSWORD_LENGTHS = range(6, 11)
+NAME_MAX_LENGTH = 9
+ADULT_AGE = 18
+
+# The text the email entry starts with, left as it is it means the email was not entered
+EMAIL_PLACEHOLDER = 'example@domain.com'
+
+PASSWORD_SPECIALS = '#$%&(_)*-'
+UPPERCASE = re.compile('[A-Z]')
+LOWERCASE = re.compile('[a-z]')
+DIGIT = re.compile('[0-9]')
+SPECIAL = re.compile(f'[{re.escape(PASSWORD_SPECIALS)}]')
+WHITESPACE = re.compile(r'\s')
+EMAIL = re.compile(r'[\w.-]+@[\w.-]+\.\w{2,3}')
+BIRTH = re.compile(r'\d{4}-\d{2}-\d{2}')
+WHOLE_NUMBER = re.compile(r'([+-]?)0*(\d+)(?:\.0*)?')
+
+# Whether a forename or surname has only letters, dots excepted
+def alphabetic(Text):
+    return Text.replace('.', '').isalpha()
+
+# The rules of every registration field in the order they are checked, a check returns a false value when the rule is broken
+RULES = {'username': (('too_short', lambda Text: len(Text) >= USERNAME_MIN_LENGTH),
+                      ('not_alphanumeric', str.isalnum)),
+         'password': (('length', lambda Text: len(Text) in PASSWORD_LENGTHS),
+                      ('no_uppercase', UPPERCASE.search),
+                      ('no_lowercase', LOWERCASE.search),
+                      ('no_digit', DIGIT.search),
+                      ('no_special', SPECIAL.search),
+                      ('whitespace', lambda Text: WHITESPACE.search(Text) is None)),
+         'email':    (('missing', lambda Text: Text not in ('', EMAIL_PLACEHOLDER)),
+                      ('format', EMAIL.fullmatch)),
+         'forename': (('missing', len),
+                      ('too_long', lambda Text: len(Text) <= NAME_MAX_LENGTH),
+                      ('not_alphabetic', alphabetic)),
+         'surname':  (('missing', len),
+                      ('too_long', lambda Text: len(Text) <= NAME_MAX_LENGTH),
+                      ('not_alphabetic', alphabetic)),
+         'birth':    (('format', BIRTH.fullmatch),)}
+
+# The accepted guesses of every bet option, by the text typed (stripped and lower case)
+GUESSES = {'single_num': range(1, 37), 'odd_even': ('even', 'odd'), 'high_low': ('low', 'high')}
+GUESS_LOOKUP = {BetType: {str(Guess): Guess for Guess in Guesses} for BetType, Guesses in GUESSES.items()}
+
+# The code of a guess that is not one of the bet option
+INVALID_GUESSES = {'single_num': 'not_1_to_36', 'odd_even': 'not_odd_even', 'high_low': 'not_high_low'}
+
+# The guess of the bet option UserGuess stands for and its error code as (Guess, Code), one of them is None.
+# Shared by validate_bet and the batch settlement so a guess is read the same way by both, numbers can be written
+# with a sign, leading zeros or a zero fraction, e.g. '+7', '07' or 7.0 (a JSON number)
+def normalise_guess(BetType, UserGuess):
+    Text = str(UserGuess).strip().lower()
+    Guess = GUESS_LOOKUP[BetType].get(Text)
+    if Guess is not None or BetType != 'single_num':
+        return Guess, None if Guess is not None else INVALID_GUESSES[BetType]
+
+    #The digits are compared as text so int() never reads a long one
+    Match = WHOLE_NUMBER.fullmatch(Text)
+    if Match is None:
+        return None, 'not_a_number'
+    Sign, Digits = Match.groups()
+    Guess = GUESS_LOOKUP[BetType].get(Digits) if Sign != '-' else None
+    return Guess, None if Guess is not None else INVALID_GUESSES[BetType]
+
+MESSAGES = {('username', 'taken'): '*Username alread exist, please choose another one',
+            ('username', 'too_short'): '*Username should be 4 characters long at least',
+            ('username', 'not_alphanumeric'): '*Username should contain only alphabetic letters and numbers',
+            ('password', 'length'): '*Password should be 6-10 characters long',
+            ('password', 'no_uppercase'): '*Password should contain one uppercase at least',
+            ('password', 'no_lowercase'): '*Password should contain one lowercase at least',
+            ('password', 'no_digit'): '*Password should contain one digit at least',
+            ('password', 'no_special'): '*Password should contain at least one special characters from #$%&(_)*-',
+            ('password', 'whitespace'): '*Password should not contain space',
+            ('email', 'missing'): '*Please enter your email',
+            ('email', 'format'): '*Please enter your email in a correct format: example@domain.com',
+            ('forename', 'missing'): '*Please enter your forename ',
+            ('forename', 'too_long'): '*Forename can not be more than 10 characters',
+            ('forename', 'not_alphabetic'): '*Forename should only contain alphabetic letters ',
+            ('surname', 'missing'): '*Please enter your Surname ',
+            ('surname', 'too_long'): '*Surname can not be more than 10 characters ',
+            ('surname', 'not_alphabetic'): '*Surname should only contain alphabetic letters ',
+            ('birth', 'format'): '*Please use the Calendar to input your birth date',
+            ('birth', 'under_age'): '*User should be 18 or over',
+            ('bet', 'missing'): '*Please enter your bet',
+            ('bet', 'not_numeric'): '*Bet should be numeric',
+            ('bet', 'too_many_decimals'): '*Bet can have at most 2 decimals',
+            ('bet', 'too_large'): '*Bet is too large',
+            ('guess', 'not_a_number'): '*You can choose only from 1 to 36',
+            ('guess', 'not_1_to_36'): '*You can choose only from 1 to 36, try again',
+            ('guess', 'not_odd_even'): '*You can choose only odd or even, try again',
+            ('guess', 'not_high_low'): '*You can choose only high or low, try again'}
+
+# The messages of the errors returned by a validator, as {field: message}
+def messages(Errors):
+    return {Field: MESSAGES[Field, Code] for Field, Code in Errors.items()}
+
+# The code of the first rule of the field the value breaks, None when it keeps all of them
+def check(Field, Value):
+    for Code, Rule in RULES[Field]:
+        if not Rule(Value):
+            return Code
+    return None
+
+# The age in whole years on Today of someone born on Birth
+def age(Birth, Today):
+    return Today.year - Birth.year - ((Today.month, Today.day) < (Birth.month, Birth.day))
+
+# Check the fields of a new player (in the order of insert_player) and return the errors as {field: code}
+# Exists(Username) tells whether the username is taken, it is not checked when Exists is None (e.g. INSERT OR IGNORE imports)
+def validate_registration(Username, Password, Email, Forename, Surname, Birth, Exists=None, Today=None):
+    Fields = {'username': Username, 'password': Password, 'email': Email, 'forename': Forename, 'surname': Surname, 'birth': Birth}
+    Errors = dict()
+    for Field, Value in Fields.items():
+        Code = check(Field, str(Value) if Value is not None else '')
+        if Code is not None:
+            Errors[Field] = Code
+
+    if 'birth' not in Errors:
+        try:
+            if age(date.fromisoformat(str(Birth)), Today or date.today()) < ADULT_AGE:
+                Errors['birth'] = 'under_age'
+        except ValueError:
+            Errors['birth'] = 'format'
+    if 'username' not in Errors and Exists is not None and Exists(Username):
+        Errors['username'] = 'taken'
+    return Errors
+
+# Check the bet amount (in dollars) and the guess of the bet option in one pass
+# and return (Bet in cents, Guess, Errors), Bet and Guess are None when they are invalid
+def validate_bet(BetType, Bet, UserGuess):
+    if BetType not in GUESS_LOOKUP:
+        raise KeyError(f'Unknown bet type {BetType}')
+
+    Errors = dict()
+    try:
+        Bet = to_cents(Bet)
+        if Bet <= 0:
+            Errors['bet'] = 'missing'
+    except AmountError as Error:
+        Bet = None
+        Errors['bet'] = Error.Code
+
+    Guess, Code = normalise_guess(BetType, UserGuess)
+    if Code is not None:
+        Errors['guess'] = Code
+    return Bet, Guess, Errors
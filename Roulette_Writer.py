@@ -0,0 +1,87 @@
+import atexit
+import queue
+import threading
+import traceback
+
+from Roulette_Database import release_connection
+
+"""
+Write-behind ledger for the GUI: settling a bet waits for SQLite (and for the disk on every commit), and a tkinter
+callback that waits freezes the whole window. LedgerWriter runs the writes on its own thread instead:
+        1-The GUI submits a write (e.g. Session.settle) with a callback, to a bounded queue, and returns at once
+        2-The writer thread runs the writes one after the other, in the order they were submitted, with its own connection
+        3-The outcome (the result or the exception raised) is put on a second queue
+        4-The GUI thread polls that queue with after() (see schedule) and runs the callbacks, so the widgets are only
+          ever touched by the GUI thread
+When MaxPending writes are waiting, submit raises queue.Full instead of blocking the GUI.
+A callback raising an exception is reported on the standard error and the others still run, polling never stops.
+Writes still waiting when the software exits are finished before it exits.
+
+    Writer = LedgerWriter()
+    Writer.schedule(Window)
+    Writer.submit(Session.settle, 'odd_even', 5, 'odd', Callback=show_result)   #show_result(Result, Error)
+"""
+
+class LedgerWriter:
+    def __init__(self, MaxPending=64):
+        self.Jobs = queue.Queue(MaxPending)
+        self.Results = queue.SimpleQueue()
+        self.Thread = threading.Thread(target=self.run, name='LedgerWriter', daemon=True)
+        self.Thread.start()
+        atexit.register(self.stop)
+
+    # Queue Function(*Arguments, **Options) and return at once, Callback(Result, Error) is run by poll afterwards
+    def submit(self, Function, *Arguments, Callback=None, **Options):
+        self.Jobs.put_nowait((Function, Arguments, Options, Callback))
+
+    # The number of writes submitted and not finished yet
+    @property
+    def Pending(self):
+        return self.Jobs.unfinished_tasks
+
+    # The writer thread: run the writes in order until stop
+    def run(self):
+        try:
+            while True:
+                Job = self.Jobs.get()
+                if Job is None:
+                    self.Jobs.task_done()
+                    break
+                Function, Arguments, Options, Callback = Job
+                Result = Error = None
+                try:
+                    Result = Function(*Arguments, **Options)
+                except Exception as Failure:
+                    Error = Failure
+                self.Results.put((Callback, Result, Error))
+                self.Jobs.task_done()
+        finally:
+            release_connection()
+
+    # Run the callbacks of the finished writes, on the thread calling it (the GUI thread)
+    def poll(self):
+        while True:
+            try:
+                Callback, Result, Error = self.Results.get_nowait()
+            except queue.Empty:
+                return
+            if Callback is not None:
+                try:
+                    Callback(Result, Error)
+                except Exception:
+                    traceback.print_exc()
+
+    # Poll every Interval milliseconds with the after() of a tkinter widget, until the widget is destroyed
+    def schedule(self, Widget, Interval=20):
+        def tick():
+            try:
+                self.poll()
+            finally:
+                Widget.after(Interval, tick)
+        Widget.after(Interval, tick)
+
+    # Finish the writes waiting and stop the thread
+    def stop(self):
+        if self.Thread.is_alive():
+            self.Jobs.put(None)
+            self.Thread.join()
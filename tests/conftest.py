@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+#The modules of the software are in the folder above, run the tests from anywhere
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Roulette_Database
+
+# A new database in the temporary folder of the test, closed when the test ends so Roulette.db is never touched
+@pytest.fixture
+def database(tmp_path):
+    Path = tmp_path / 'Roulette.db'
+    Roulette_Database.open_database(str(Path))
+    yield Path
+    Roulette_Database.Pool.close()
+    Roulette_Database.Pool = None
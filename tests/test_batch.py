@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from Roulette_Database import connection, insert_player
+from Roulette_Engine import BetError, settle_batch
+from Roulette_RNG import PCG64Source
+
+# Recording needs one username per bet, nothing is written otherwise
+@pytest.mark.parametrize('Usernames', [['Hassan'], None])
+def test_record_needs_every_player(database, Usernames):
+    insert_player('Hassan', 'x', 'hassan@example.com', 'Hassan', 'Ali', '2000-01-01', 10000)
+    with pytest.raises(ValueError):
+        settle_batch(Usernames, ['odd_even']*3, ['odd']*3, [100]*3, Record=True, Source=PCG64Source(0))
+    assert connection().execute("SELECT (SELECT COUNT(*) FROM History) + (SELECT COUNT(*) FROM SpinLog)").fetchone()[0] == 0
+
+def test_record(database):
+    insert_player('Hassan', 'x', 'hassan@example.com', 'Hassan', 'Ali', '2000-01-01', 10000)
+    Result = settle_batch(['Hassan']*3, ['odd_even']*3, ['odd']*3, np.full(3, 100), Record=True, Source=PCG64Source(0))
+    assert connection().execute("SELECT SUM(Credit), COUNT(*) FROM History").fetchone() == (sum(Result.Credits.tolist()), 3)
+
+# Integer inputs are checked before they are cast to small integer types, which would wrap them around
+def test_out_of_range_codes():
+    with pytest.raises(KeyError):
+        settle_batch(None, np.array([256]), np.array([7]), np.array([100]), RandValues=7)
+    with pytest.raises(BetError) as Error:
+        settle_batch(None, np.array([0, 1]), np.array([65543, 65537]), np.array([100, 100]), RandValues=7)
+    assert 'guess' in Error.value.Errors
+
+@pytest.mark.parametrize('RandValues', [0, 37, 99, [7, 99], 7.0, -1])
+def test_out_of_range_spins(RandValues):
+    with pytest.raises(ValueError):
+        settle_batch(None, ['odd_even']*2, ['odd']*2, [100]*2, RandValues=RandValues)
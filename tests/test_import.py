@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+import Roulette_Password
+
+from Roulette_Database import connection, get_player, insert_player
+from Roulette_Import import RowError, bulk_import
+from Roulette_Password import hash_password, is_current, set_cost, verify_password
+
+# Write the rows as a JSONL file in the folder of the test and return its path
+def write_rows(tmp_path, Rows):
+    Path = tmp_path / 'transactions.jsonl'
+    Path.write_text(''.join(json.dumps(Row) + '\n' for Row in Rows))
+    return str(Path)
+
+REPLAY = {'Username': 'Hassan', 'BetType': 'odd_even', 'Bet': '1.50', 'Guess': 'odd', 'RandValue': 7}
+
+@pytest.fixture
+def player(database):
+    insert_player('Hassan', 'x', 'hassan@example.com', 'Hassan', 'Ali', '2000-01-01', 10000)
+
+def test_replay(tmp_path, player):
+    Path = write_rows(tmp_path, [{'Username': 'Hassan', 'Credit': '2.50'}, REPLAY, dict(REPLAY, Guess='07', BetType='single_num', RandValue='7')])
+    assert bulk_import(TransactionsPath=Path)[1] == 3
+    assert connection().execute("SELECT Credit FROM History ORDER BY HistoryID").fetchall() == [(250,), (300,), (5400,)]
+
+@pytest.mark.parametrize('Row, Field', [(dict(REPLAY, RandValue=200), 'RandValue'), (dict(REPLAY, RandValue=0), 'RandValue'),
+                                        (dict(REPLAY, RandValue='1'*5000), 'RandValue'), (dict(REPLAY, BetType='red_black'), 'BetType'),
+                                        (dict(REPLAY, BetType=['odd_even']), 'BetType'), (dict(REPLAY, Guess='high'), 'Guess'),
+                                        (dict(REPLAY, Bet='1.005'), 'Bet'), ({'Username': 'Hassan', 'Bet': '1'}, 'BetType'),
+                                        ({k: v for k, v in REPLAY.items() if k != 'RandValue'}, 'RandValue'),
+                                        ({k: v for k, v in REPLAY.items() if k != 'Username'}, 'Username'),
+                                        ({'Username': 'Hassan', 'Credit': 'ten'}, 'Credit'),
+                                        ({'Username': 'Hassan', 'Credit': '1', 'TimeDate': 'yesterday'}, 'TimeDate')])
+def test_invalid_rows(tmp_path, player, Row, Field):
+    Path = write_rows(tmp_path, [{'Username': 'Hassan', 'Credit': '1'}, Row])
+    with pytest.raises(RowError) as Error:
+        bulk_import(TransactionsPath=Path)
+    assert (Error.value.Number, Error.value.Field) == (2, Field)
+    assert connection().execute("SELECT COUNT(*) FROM History").fetchone()[0] == 0
+
+# Rows are numbered across batches
+def test_row_numbers(tmp_path, player):
+    Path = write_rows(tmp_path, [{'Username': 'Hassan', 'Credit': '1'}]*4 + [dict(REPLAY, RandValue=99)])
+    with pytest.raises(RowError, match='row 5, RandValue'):
+        bulk_import(TransactionsPath=Path, BatchSize=2)
+
+PLAYERS = [{'Username': 'Hassan', 'Password': 'Secret#1', 'Email': 'hassan@example.com', 'Forename': 'Hassan', 'Surname': 'Ali',
+            'Birth': '2000-01-01', 'Balance': '10'},
+           {'Username': 'Sarah', 'Email': 'sarah@example.com', 'Forename': 'Sarah', 'Surname': 'Ali',
+            'Birth': '2000-01-01'}]
+
+# Plain text passwords are hashed by the import, with or without a pool of processes, hashes are kept as they are
+@pytest.mark.parametrize('Workers', [0, 2])
+def test_players_hashed(tmp_path, database, Workers):
+    Previous = Roulette_Password.Cost
+    set_cost(10)
+    try:
+        Hashed = hash_password('Secret#2')
+        Path = tmp_path / 'players.jsonl'
+        Path.write_text(''.join(json.dumps(Row) + '\n' for Row in [PLAYERS[0], dict(PLAYERS[1], Password=Hashed)]))
+        assert bulk_import(PlayersPath=str(Path), Validate=True, Workers=Workers)[0] == 2
+        Stored = dict(connection().execute("SELECT Username, Password FROM Players").fetchall())
+        assert is_current(Stored['Hassan']) and verify_password('Secret#1', Stored['Hassan'])
+        assert Stored['Sarah'] == Hashed
+        assert get_player('Hassan')[0][6] == 1000
+    finally:
+        set_cost(Previous)
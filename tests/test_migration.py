@@ -0,0 +1,93 @@
+import sqlite3
+
+import Roulette_Database
+from Roulette_Database import SCHEMA_VERSION, connection, get_player, get_player_stats, open_database
+
+# The declared type of every column of the table, e.g. {'Balance': 'INTEGER'}
+def column_types(Table):
+    return {Column[1]: Column[2] for Column in connection().execute(f"PRAGMA table_info({Table})")}
+
+# Create a database of an older version from its SQL and open it, which migrates it
+def open_old_database(tmp_path, Script):
+    Path = str(tmp_path / 'Roulette.db')
+    with sqlite3.connect(Path) as Connection:
+        Connection.executescript(Script)
+    Connection.close()
+    open_database(Path)
+
+# The tables of a version 0 database (like the Roulette.db shipped with the software), History without a primary key
+VERSION_0 = """
+    CREATE TABLE Players (Username TEXT UNIQUE NOT NULL, Password TEXT NOT NULL, Email TEXT NOT NULL, Forename TEXT,
+                          Surname TEXT, Birth TEXT, Balance REAL NOT NULL DEFAULT 0, CHECK(Balance >= 0), PRIMARY KEY(Username));
+    CREATE TABLE History (Username TEXT NOT NULL, Credit REAL NOT NULL, BetType TEXT, TimeDate TEXT,
+                          FOREIGN KEY (Username) REFERENCES Players (Username));
+    INSERT INTO Players VALUES ('alice', 'Secret#1', 'alice@example.com', 'Alice', 'Smith', '2000-01-01', 182.5);
+    INSERT INTO History VALUES ('alice', 100.1, NULL, '2024-01-01 10:00:00');
+    INSERT INTO History VALUES ('alice', -2.5, 'odd_even', '2024-01-01 10:01:00');
+    INSERT INTO History VALUES ('alice', 84.0, 'single_num', '2024-01-01 10:02:00');
+    INSERT INTO History VALUES ('alice', 0.9, NULL, '2024-01-01 10:03:00');
+"""
+
+# The tables of a version 3 database, money held as REAL dollars
+VERSION_3 = """
+    CREATE TABLE Players (Username TEXT UNIQUE NOT NULL, Password TEXT NOT NULL, Email TEXT NOT NULL, Forename TEXT,
+                          Surname TEXT, Birth TEXT, Balance REAL NOT NULL DEFAULT 0, CHECK(Balance >= 0), PRIMARY KEY(Username));
+    CREATE TABLE SpinLog (SpinID INTEGER PRIMARY KEY, Source TEXT NOT NULL, Seed TEXT NOT NULL, Position INTEGER NOT NULL,
+                          RandValue INTEGER NOT NULL, TimeDate INTEGER NOT NULL);
+    CREATE TABLE History (HistoryID INTEGER PRIMARY KEY, Username TEXT NOT NULL, Credit REAL NOT NULL, BetType TEXT,
+                          TimeDate INTEGER NOT NULL, SpinID INTEGER REFERENCES SpinLog (SpinID),
+                          FOREIGN KEY (Username) REFERENCES Players (Username));
+    CREATE TABLE PlayerStats (Username TEXT PRIMARY KEY REFERENCES Players (Username), TotalStaked REAL NOT NULL DEFAULT 0,
+                              TotalWon REAL NOT NULL DEFAULT 0, SingleNumBets INTEGER NOT NULL DEFAULT 0,
+                              OddEvenBets INTEGER NOT NULL DEFAULT 0, HighLowBets INTEGER NOT NULL DEFAULT 0,
+                              Deposits REAL NOT NULL DEFAULT 0, Withdrawals REAL NOT NULL DEFAULT 0, LastActivity INTEGER) WITHOUT ROWID;
+    INSERT INTO Players VALUES ('alice', 'Secret#1', 'alice@example.com', 'Alice', 'Smith', '2000-01-01', 10.3);
+    INSERT INTO History VALUES (1, 'alice', 20.1, NULL, 100, NULL);
+    INSERT INTO History VALUES (2, 'alice', -0.3, 'odd_even', 200, NULL);
+    INSERT INTO History VALUES (3, 'alice', -9.5, NULL, 300, NULL);
+    INSERT INTO PlayerStats VALUES ('alice', 0.3, 0, 0, 1, 0, 20.1, 9.5, 300);
+    PRAGMA user_version = 3;
+"""
+
+def test_migrate_version_0(tmp_path):
+    open_old_database(tmp_path, VERSION_0)
+    try:
+        conn = connection()
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert column_types('History')['Credit'] == 'INTEGER'
+        assert get_player('alice')[0][6] == 18250
+        assert conn.execute("SELECT Credit FROM History ORDER BY HistoryID").fetchall() == [(10010,), (-250,), (8400,), (90,)]
+        assert conn.execute("SELECT SUM(Credit) FROM History").fetchone()[0] == 18250
+        Stats = get_player_stats('alice')
+        assert (Stats['TotalStaked'], Stats['TotalWon'], Stats['Deposits']) == (250 + 8400 // 36, 8400, 10100)
+        assert (Stats['SingleNumBets'], Stats['OddEvenBets']) == (1, 1)
+    finally:
+        Roulette_Database.Pool.close()
+        Roulette_Database.Pool = None
+
+def test_migrate_version_3(tmp_path):
+    open_old_database(tmp_path, VERSION_3)
+    try:
+        conn = connection()
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert column_types('Players')['Balance'] == 'INTEGER'
+        assert column_types('History')['Credit'] == 'INTEGER'
+        assert column_types('PlayerStats')['TotalStaked'] == 'INTEGER'
+
+        assert get_player('alice')[0][6] == 1030
+        assert conn.execute("SELECT Credit FROM History ORDER BY HistoryID").fetchall() == [(2010,), (-30,), (-950,)]
+        #The balance is exactly the sum of the history, the totals are copied and not rebuilt
+        assert conn.execute("SELECT SUM(Credit) FROM History").fetchone()[0] == 1030
+        assert get_player_stats('alice') == {'Username': 'alice', 'TotalStaked': 30, 'TotalWon': 0, 'SingleNumBets': 0,
+                                             'OddEvenBets': 1, 'HighLowBets': 0, 'Deposits': 2010, 'Withdrawals': 950,
+                                             'LastActivity': 300}
+        assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE '%Version%'").fetchone()[0] == 0
+    finally:
+        Roulette_Database.Pool.close()
+        Roulette_Database.Pool = None
+
+# A database made by this version is left as it is
+def test_new_database(database):
+    assert connection().execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert column_types('PlayerStats')['Deposits'] == 'INTEGER'
@@ -0,0 +1,32 @@
+import pytest
+
+from Roulette_Money import AmountError, format_amount, format_money, from_cents, to_cents
+
+@pytest.mark.parametrize('Amount, Cents', [('10', 1000), ('10.5', 1050), (' 0.25 ', 25), ('-3.5', -350), ('+7', 700),
+                                           (12, 1200), (0.1, 10), (5.5, 550), ('1e2', 10000), ('999999999999999.99', 99999999999999999)])
+def test_to_cents(Amount, Cents):
+    assert to_cents(Amount) == Cents
+
+@pytest.mark.parametrize('Amount, Code', [('', 'not_numeric'), ('ten', 'not_numeric'), ('nan', 'not_numeric'), ('inf', 'not_numeric'),
+                                          (True, 'not_numeric'), (None, 'not_numeric'), ('0.125', 'too_many_decimals'),
+                                          (0.001, 'too_many_decimals'), (2.675, 'too_many_decimals'), ('1e-9999999999', 'too_many_decimals'),
+                                          ('1000000000000000', 'too_large'), (10**16, 'too_large'),
+                                          (1e300, 'too_large'), ('1'*5000, 'too_large'), ('1e999999', 'too_large')])
+def test_to_cents_rejects(Amount, Code):
+    with pytest.raises(AmountError) as Error:
+        to_cents(Amount)
+    assert Error.value.Code == Code
+
+# The sum of the cents is exact where the sum of the floats is not
+def test_cents_add_up():
+    assert sum(map(to_cents, ['0.1', '0.2'])) == to_cents('0.3')
+
+@pytest.mark.parametrize('Cents, Text', [(1050, '10.50'), (-5, '-0.05'), (0, '0.00'), (123456789, '1234567.89')])
+def test_format_amount(Cents, Text):
+    assert format_amount(Cents) == Text
+    assert to_cents(format_amount(Cents)) == Cents
+
+def test_format_money():
+    assert format_money(1050) == '$10.50'
+    assert format_money(-5) == '-$0.05'
+    assert from_cents(1050) == 10.5
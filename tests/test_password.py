@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import Roulette_Password
+from Roulette_Database import connection, get_player, insert_player
+from Roulette_Password import (ALGORITHM, check_login, hash_password, is_current, is_hashed, parse_hash, set_cost,
+                               verify_password)
+
+# The lowest cost keeps the tests fast, the cost and the cache of verified passwords are put back afterwards
+@pytest.fixture(autouse=True)
+def low_cost():
+    Previous = Roulette_Password.Cost
+    set_cost(10)
+    yield
+    set_cost(Previous)
+    Roulette_Password.VerifiedCache.clear()
+
+def test_hash_and_verify():
+    Stored = hash_password('Secret#1')
+    assert is_hashed(Stored) and is_current(Stored)
+    assert Stored != hash_password('Secret#1')
+    assert verify_password('Secret#1', Stored)
+    assert not verify_password('Secret#2', Stored)
+
+def test_pbkdf2():
+    Stored = hash_password('Secret#1', 'pbkdf2_sha256')
+    assert parse_hash(Stored)[0] == 'pbkdf2_sha256'
+    assert verify_password('Secret#1', Stored)
+    assert not verify_password('secret#1', Stored)
+
+# A record with parameters out of the limits is never hashed, so it can not raise or take hours
+@pytest.mark.parametrize('Stored', ['scrypt$40$8$1$00$00', 'scrypt$14$9999$1$00$00', 'scrypt$14$8$99$00$00',
+                                    'scrypt$14$8$1$zz$00', 'pbkdf2_sha256$60$00$00', 'scrypt$' + '9'*5000 + '$8$1$00$00'])
+def test_out_of_limits(Stored):
+    assert not is_hashed(Stored)
+    assert not verify_password('Secret#1', Stored)
+
+def test_set_cost_limits():
+    with pytest.raises(ValueError):
+        set_cost(99)
+
+# A plain text password of a record made before passwords were hashed is hashed again on the first login
+def test_rehash_legacy_password(database):
+    insert_player('Hassan', 'Secret#1', 'hassan@example.com', 'Hassan', 'Ali', '2000-01-01')
+    Record, Valid = check_login('Hassan', 'Secret#2')
+    assert not Valid and get_player('Hassan')[0][1] == 'Secret#1'
+
+    Record, Valid = check_login('Hassan', 'Secret#1')
+    Stored = get_player('Hassan')[0][1]
+    assert Valid and is_current(Stored) and Record[1] == Stored
+    assert parse_hash(Stored)[0] == ALGORITHM
+    assert check_login('Hassan', 'Secret#1')[1]
+
+# A hash of another cost is replaced by one of the current cost
+def test_rehash_other_cost(database):
+    set_cost(11)
+    insert_player('Hassan', hash_password('Secret#1'), 'hassan@example.com', 'Hassan', 'Ali', '2000-01-01')
+    set_cost(10)
+    assert check_login('Hassan', 'Secret#1')[1]
+    assert parse_hash(get_player('Hassan')[0][1])[2][0] == 10
+
+def test_unknown_username(database):
+    assert check_login('Nobody', 'Secret#1') == (None, False)
+    assert connection().execute("SELECT COUNT(*) FROM Players").fetchone()[0] == 0
+
+@pytest.mark.parametrize('Value, Cost', [('12', 12), ('abc', None), ('99', None), ('', None)])
+def test_environment_cost(Value, Cost):
+    Result = subprocess.run([sys.executable, '-c', 'import Roulette_Password as P; print(P.Cost, P.DEFAULT_COSTS[P.ALGORITHM])'],
+                            capture_output=True, text=True, env=dict(os.environ, ROULETTE_PASSWORD_COST=Value),
+                            cwd=os.path.dirname(os.path.abspath(Roulette_Password.__file__)))
+    Current, Default = map(int, Result.stdout.split())
+    assert Current == (Cost if Cost is not None else Default)
+    assert ('ROULETTE_PASSWORD_COST' in Result.stderr) == (Value not in ('', '12'))
@@ -0,0 +1,28 @@
+from Roulette_Database import insert_player, update_balance
+from Roulette_Session import Player
+
+def test_cached_balance(database):
+    insert_player('Hassan', 'x', 'hassan@example.com', 'Hassan', 'Ali', '2000-01-01', 1000)
+    Session = Player('Hassan')
+    assert Session.insert_transaction(500)
+    assert Session.Balance == 1500
+    assert not Session.insert_transaction(-2000)
+    assert Session.Balance == 1500
+
+# The balance changed outside of the session: a write the cached balance allows but the database rejects reloads it
+def test_rejected_by_database(database):
+    insert_player('Hassan', 'x', 'hassan@example.com', 'Hassan', 'Ali', '2000-01-01', 1000)
+    Session = Player('Hassan')
+    assert Session.Balance == 1000
+    update_balance('Hassan', -900)
+    assert not Session.insert_transaction(-500)
+    assert Session.Balance == 100
+
+    update_balance('Hassan', -100)
+    assert Session.Balance == 100
+    assert not Session.settle('odd_even', '1', 'odd', RandValue=7).Accepted
+    assert Session.Balance == 0
+    update_balance('Hassan', 100)
+    Session.invalidate()
+    assert Session.settle('odd_even', '1', 'odd', RandValue=7).Accepted
+    assert Session.Balance == 300
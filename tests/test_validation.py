@@ -0,0 +1,82 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from Roulette_Engine import BetError, encode_bet_types, encode_guesses, parse_bet, settle_batch
+from Roulette_Validation import MESSAGES, messages, validate_bet, validate_registration
+
+TODAY = date(2026, 1, 1)
+VALID = {'Username': 'Hassan', 'Password': 'Secret#1', 'Email': 'hassan@example.com', 'Forename': 'Hassan', 'Surname': 'Ali',
+         'Birth': '2000-01-01'}
+
+def test_valid_registration():
+    assert validate_registration(**VALID, Today=TODAY) == {}
+
+@pytest.mark.parametrize('Field, Value, Code', [('Username', 'abc', 'too_short'), ('Username', 'ab cd', 'not_alphanumeric'),
+                                                ('Password', 'Se#1', 'length'), ('Password', 'secret#1', 'no_uppercase'),
+                                                ('Password', 'SECRET#1', 'no_lowercase'), ('Password', 'Secret#a', 'no_digit'),
+                                                ('Password', 'Secret11', 'no_special'), ('Password', 'Sec ret#1', 'whitespace'),
+                                                ('Email', '', 'missing'), ('Email', 'example@domain.com', 'missing'),
+                                                ('Email', 'hassan@example', 'format'), ('Forename', '', 'missing'),
+                                                ('Forename', 'Maximilian', 'too_long'), ('Surname', 'Al1', 'not_alphabetic'),
+                                                ('Birth', '01/01/2000', 'format'), ('Birth', '2000-02-30', 'format'),
+                                                ('Birth', '2008-01-02', 'under_age')])
+def test_registration_codes(Field, Value, Code):
+    Errors = validate_registration(**dict(VALID, **{Field: Value}), Today=TODAY)
+    assert Errors == {Field.lower(): Code}
+    assert (Field.lower(), Code) in MESSAGES
+
+# Exists is only asked about a username that is valid otherwise
+def test_username_taken():
+    Asked = []
+    def exists(Username):
+        Asked.append(Username)
+        return True
+    assert validate_registration(**VALID, Exists=exists, Today=TODAY) == {'username': 'taken'}
+    assert validate_registration(**dict(VALID, Username='abc'), Exists=exists, Today=TODAY) == {'username': 'too_short'}
+    assert Asked == ['Hassan']
+
+@pytest.mark.parametrize('Guess', ['7', ' 7 ', '07', '+7', 7, 7.0, '7.0'])
+def test_number_guesses(Guess):
+    assert validate_bet('single_num', '5', Guess) == (500, 7, {})
+
+@pytest.mark.parametrize('BetType, Bet, Guess, Errors', [('single_num', '5', '40', {'guess': 'not_1_to_36'}),
+                                                         ('single_num', '5', '0', {'guess': 'not_1_to_36'}),
+                                                         ('single_num', '5', '-7', {'guess': 'not_1_to_36'}),
+                                                         ('single_num', '5', 7.5, {'guess': 'not_a_number'}),
+                                                         ('single_num', '5', 'seven', {'guess': 'not_a_number'}),
+                                                         ('single_num', '5', '1'*5000, {'guess': 'not_1_to_36'}),
+                                                         ('odd_even', '5', 'high', {'guess': 'not_odd_even'}),
+                                                         ('high_low', '5', 'odd', {'guess': 'not_high_low'}),
+                                                         ('odd_even', '', 'odd', {'bet': 'not_numeric'}),
+                                                         ('odd_even', '0', 'odd', {'bet': 'missing'}),
+                                                         ('odd_even', '1.005', 'odd', {'bet': 'too_many_decimals'}),
+                                                         ('single_num', '1'*5000, 'x', {'bet': 'too_large', 'guess': 'not_a_number'})])
+def test_bet_codes(BetType, Bet, Guess, Errors):
+    assert validate_bet(BetType, Bet, Guess)[2] == Errors
+    assert set(messages(Errors)) == set(Errors)
+
+def test_word_guesses():
+    assert validate_bet('odd_even', '1.50', ' Odd ') == (150, 'odd', {})
+    assert validate_bet('high_low', 2, 'LOW') == (200, 'low', {})
+
+def test_parse_bet_raises():
+    with pytest.raises(BetError) as Error:
+        parse_bet('single_num', '1'*5000, '7')
+    assert Error.value.Codes == {'bet': 'too_large'}
+    with pytest.raises(KeyError):
+        parse_bet('red_black', '5', 'red')
+
+# The batch settlement reads every guess the way validate_bet does
+def test_batch_guesses_match():
+    BetTypes = ['single_num']*9 + ['odd_even', 'high_low', 'odd_even']
+    Guesses = ['7', ' 07', '+7', '7.0', '0', '37', '-7', 'x', '1'*5000, ' Odd ', 'HIGH', 'low']
+    Encoded = encode_guesses(encode_bet_types(BetTypes), np.array(Guesses, dtype=object)).tolist()
+    for BetType, Guess, Value in zip(BetTypes, Guesses, Encoded):
+        assert (Value >= 0) == (validate_bet(BetType, '1', Guess)[1] is not None)
+
+def test_batch_refuses_float_bets():
+    with pytest.raises(BetError):
+        settle_batch(None, ['odd_even'], ['odd'], [5.0], RandValues=3)
+    assert settle_batch(None, ['odd_even'], ['odd'], [500], RandValues=3).Credits.tolist() == [1000]